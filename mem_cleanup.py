@@ -0,0 +1,155 @@
+"""Memory cleanup routine shared by the GUI and the library API.
+
+Kept free of GUI imports so that headless consumers (see ``mem_monitor``)
+can trigger the same cleanup the "Clear Memory" button runs.
+"""
+
+from __future__ import annotations
+
+import gc
+import subprocess
+import time
+from typing import Optional
+
+import psutil
+
+from mem_refault import RefaultTracker
+from mem_trim import ParallelTrimmer, TrimReport, TrimResult
+
+
+# Never trimmed by the working-set stage
+PROTECTED_NAMES = ['system', 'svchost.exe', 'csrss.exe', 'lsass.exe', 'python.exe', 'dwm.exe']
+
+# Follows up every trim for a minute and reports its net benefit
+REFAULT_TRACKER = RefaultTracker(on_outcome=lambda o: print(f'Trim outcome: {o.describe()}'))
+
+# Shared by every cleanup path, so threads stuck in a timed-out trim keep
+# counting against one bounded pool
+TRIMMER = ParallelTrimmer()
+
+
+def trim_working_sets(pids=None, trimmer: Optional[ParallelTrimmer] = None, tracker: Optional[RefaultTracker] = None) -> TrimReport:
+	"""Empty the working set of each process (all processes if ``pids`` is None).
+
+	``pids`` may hold ``(pid, create_time)`` pairs; a pid whose process
+	started at a different time has been reused and is skipped. Processes in
+	``PROTECTED_NAMES`` and pids that have exited are skipped too.
+	Trims run in parallel with a per-process timeout and an overall deadline
+	on ``trimmer`` (default: the shared ``TRIMMER``; see ``mem_trim``). With
+	a ``tracker``, busy processes are reported as ``'deferred'`` instead of
+	being trimmed, and the refault cost of each trim is measured afterwards
+	(see ``mem_refault``).
+	"""
+	targets = []
+	procs = psutil.process_iter(['pid', 'name']) if pids is None else pids
+	for proc in procs:
+		try:
+			if isinstance(proc, tuple):
+				pid, create_time = proc
+				proc = psutil.Process(pid)
+				if abs(proc.create_time() - create_time) >= 1.0:
+					continue
+			elif not isinstance(proc, psutil.Process):
+				proc = psutil.Process(proc)
+			pinfo = proc.as_dict(attrs=['pid', 'name'])
+			pname = (pinfo.get('name') or '').lower()
+			if pname in PROTECTED_NAMES:
+				continue
+			targets.append((pinfo.get('pid'), pname))
+		except Exception:
+			continue
+	try:
+		if trimmer is None:
+			trimmer = TRIMMER
+		if tracker is not None and trimmer.tracker not in (None, tracker):
+			raise ValueError('trimmer already has a different refault tracker')
+		deferred = []
+		if tracker is not None:
+			targets, deferred = tracker.select(targets)
+		report = trimmer.run(targets, tracker=tracker)
+		if deferred:
+			results = report.results + [TrimResult(pid, name, 'deferred', 0.0, reason) for pid, name, reason in deferred]
+			report = report._replace(results=results)
+		return report
+	except Exception as e:
+		print(f'API cleanup error: {e}')
+		return TrimReport([], 0.0, False)
+
+
+def cleanup_memory() -> bool:
+	try:
+		print('Starting aggressive memory cleanup...')
+		
+		# PowerShell aggressive cleanup routine
+		ps_command = """
+# Stage 1: Clear DNS and network caches
+Write-Host 'Stage 1: Clearing DNS cache...'
+try { ipconfig /flushdns 2>$null } catch {}
+
+# Stage 2: Flush file cache
+Write-Host 'Stage 2: Flushing file buffers...'
+try { Clear-DnsClientCache 2>$null } catch {}
+
+# Stage 3: Garbage collection in PowerShell
+Write-Host 'Stage 3: PowerShell GC...'
+[System.GC]::Collect()
+[System.GC]::WaitForPendingFinalizers()
+
+# Stage 4: Force cleanup of unused memory
+Write-Host 'Stage 4: Clearing standby memory...'
+try {
+    Get-Process | Where-Object { $_.ProcessName -notmatch 'svchost|csrss|lsass|System|dwm' } | ForEach-Object {
+        try {
+            $_.MinWorkingSet = $_.MinWorkingSet
+        } catch {}
+    }
+} catch {}
+
+# Stage 5: Additional cleanup
+Write-Host 'Stage 5: Final memory trim...'
+for ($i = 0; $i -lt 15; $i++) {
+    [System.GC]::Collect()
+    [System.GC]::WaitForPendingFinalizers()
+    Start-Sleep -Milliseconds 20
+}
+
+Write-Host 'Memory cleanup completed'
+"""
+		
+		try:
+			result = subprocess.run(
+				["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", ps_command],
+				capture_output=True,
+				timeout=30,
+				text=True,
+				creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0x08000000
+			)
+			output = result.stdout + result.stderr
+			for line in output.split('\n'):
+				if 'Stage' in line or 'cleanup' in line.lower() or 'completed' in line.lower():
+					print(line)
+		except Exception as e:
+			print(f'PowerShell cleanup error: {e}')
+		
+		# Python GC cleanup
+		print('Stage 6: Python garbage collection...')
+		for _ in range(10):
+			gc.collect()
+			time.sleep(0.05)
+		
+		# Aggressive Windows API cleanup
+		print('Stage 7: API working set cleanup...')
+		report = trim_working_sets(tracker=REFAULT_TRACKER)
+		print(f'Stage 7: {report.summary()}')
+		REFAULT_TRACKER.start()
+		if REFAULT_TRACKER.outcomes:
+			print(f'Earlier trims: {REFAULT_TRACKER.summary()}')
+		
+		time.sleep(1)
+		mem = psutil.virtual_memory()
+		print(f'Memory cleanup finished - Current memory usage: {mem.percent:.1f}%')
+		return True
+		
+	except Exception as e:
+		print(f'Cleanup error: {e}')
+		return False
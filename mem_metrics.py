@@ -0,0 +1,299 @@
+"""Tiered metric collection.
+
+Each ``Collector`` names a data source, a cost class and the interval it
+wants. On every tick ``MetricRegistry`` finds the collectors that are due,
+groups them by source and fetches each source once: one
+``psutil.virtual_memory()`` call, one ``/proc/meminfo`` read, or one walk
+over all processes. The result is shared by every due collector of that
+source.
+
+Collection time is limited by token buckets. ``budget`` is the number of
+seconds per second that collection may use. It is split between the cost
+classes (``BUDGET_SHARES``) and each class has its own bucket, so an
+expensive walk can never starve the cheap tier. A group is charged to the
+bucket of its costliest collector. Groups that do not fit are deferred to a
+later tick, cheapest and most overdue first. A group costlier than its whole
+bucket may still run once the bucket is full; the bucket then goes into
+debt by the excess and the tier waits until it is repaid, so over time no
+class spends more than its share. Every metric keeps the time it was last
+collected, so consumers can check its age.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import psutil
+
+
+# Initial cost estimates (seconds) per cost class, refined by measurement
+COST_CLASSES = {'cheap': 0.001, 'medium': 0.005, 'expensive': 0.05}
+# Share of the collection budget reserved for each cost class
+BUDGET_SHARES = {'cheap': 0.2, 'medium': 0.3, 'expensive': 0.5}
+TOP_N = 10
+
+
+class Collector:
+	def __init__(self, name: str, source: str, fn: Callable[[Any], Any], interval: float = 1.0, cost: str = 'cheap'):
+		if cost not in COST_CLASSES:
+			raise ValueError(f'unknown cost class: {cost}')
+		self.name = name
+		self.source = source
+		self.fn = fn
+		self.interval = interval
+		self.cost = cost
+		self.value: Any = None
+		self.updated = 0.0  # time.time() of the last successful collection
+		self.next_due = 0.0  # time.monotonic()
+		self.error = ''
+
+
+class MetricRegistry:
+	"""Collectors, their sources and the collection budget.
+
+	``budget`` is in seconds of collection per second; ``burst`` is how many
+	seconds of unused budget may accumulate in each class bucket.
+	"""
+
+	def __init__(self, budget: float = 0.05, burst: float = 10.0):
+		self.budget = budget
+		self.burst = burst
+		self.sources: Dict[str, Callable[[], Any]] = {}
+		self.collectors: Dict[str, Collector] = {}
+		self.spent = 0.0  # total seconds spent collecting
+		self.deferred = 0  # source groups postponed for lack of budget
+		self._estimates: Dict[str, float] = {}  # source -> smoothed cost
+		self._tokens = {cost: self._capacity(cost) for cost in COST_CLASSES}
+		self._last_refill = time.monotonic()
+		self._lock = threading.Lock()
+
+	def register_source(self, name: str, fetch: Callable[[], Any]):
+		self.sources[name] = fetch
+
+	def register(self, collector: Collector) -> Collector:
+		if collector.source not in self.sources:
+			raise KeyError(f'unknown source: {collector.source}')
+		with self._lock:
+			self.collectors[collector.name] = collector
+		return collector
+
+	# -- reading --
+
+	def get(self, name: str, max_age: Optional[float] = None) -> Any:
+		"""Latest value of a metric, or None if missing or older than ``max_age``."""
+		c = self.collectors.get(name)
+		if c is None or not c.updated:
+			return None
+		if max_age is not None and time.time() - c.updated > max_age:
+			return None
+		return c.value
+
+	def age(self, name: str) -> Optional[float]:
+		c = self.collectors.get(name)
+		if c is None or not c.updated:
+			return None
+		return time.time() - c.updated
+
+	def freshness(self) -> Dict[str, Optional[float]]:
+		return {name: self.age(name) for name in list(self.collectors)}
+
+	# -- collecting --
+
+	def _capacity(self, cost: str) -> float:
+		return self.budget * BUDGET_SHARES[cost] * self.burst
+
+	def _refill(self, now: float):
+		elapsed = now - self._last_refill
+		for cost in self._tokens:
+			self._tokens[cost] = min(self._capacity(cost), self._tokens[cost] + elapsed * self.budget * BUDGET_SHARES[cost])
+		self._last_refill = now
+
+	def tokens(self) -> Dict[str, float]:
+		"""Remaining budget (seconds) per cost class; negative while in debt."""
+		with self._lock:
+			self._refill(time.monotonic())
+			return dict(self._tokens)
+
+	def tick(self) -> int:
+		"""Run due collectors within budget; returns the number collected."""
+		with self._lock:
+			now = time.monotonic()
+			self._refill(now)
+			groups: Dict[str, List[Collector]] = {}
+			for c in self.collectors.values():
+				if now >= c.next_due:
+					groups.setdefault(c.source, []).append(c)
+			if not groups:
+				return 0
+
+			def priority(item: Tuple[str, List[Collector]]):
+				source, cs = item
+				cost = max(COST_CLASSES[c.cost] for c in cs)
+				overdue = max((now - c.next_due) / c.interval for c in cs)
+				return (cost, -overdue)
+
+			collected = 0
+			for source, cs in sorted(groups.items(), key=priority):
+				cost_class = max((c.cost for c in cs), key=COST_CLASSES.__getitem__)
+				cap = self._capacity(cost_class)
+				tokens = self._tokens[cost_class]
+				estimate = self._estimates.get(source, COST_CLASSES[cost_class])
+				# a group costlier than the whole bucket may run when the bucket is full
+				if estimate > tokens and not (estimate > cap and tokens >= cap):
+					self.deferred += 1
+					continue
+				start = time.perf_counter()
+				try:
+					data = self.sources[source]()
+				except Exception as e:
+					data = None
+					for c in cs:
+						c.error = str(e)
+				stamp = time.time()
+				if data is not None:
+					for c in cs:
+						try:
+							c.value = c.fn(data)
+							c.updated = stamp
+							c.error = ''
+							collected += 1
+						except Exception as e:
+							c.error = str(e)
+				spent = time.perf_counter() - start
+				self._estimates[source] = spent if source not in self._estimates else 0.7 * self._estimates[source] + 0.3 * spent
+				# the debt is not capped: the tier waits as long as it overspent
+				self._tokens[cost_class] = tokens - spent
+				self.spent += spent
+				done = time.monotonic()
+				for c in cs:
+					c.next_due = done + c.interval
+			return collected
+
+	def run(self, stop_event: threading.Event, resolution: float = 0.25):
+		"""Tick until ``stop_event`` is set (meant for a daemon thread)."""
+		while not stop_event.is_set():
+			try:
+				self.tick()
+			except Exception as e:
+				print(f'metrics tick error: {e}')
+			stop_event.wait(resolution)
+
+
+# --- Default sources and collectors ---
+
+def read_meminfo(path: str = '/proc/meminfo') -> Dict[str, int]:
+	"""Parse /proc/meminfo into bytes."""
+	out = {}
+	with open(path, 'rb') as f:
+		for line in f:
+			key, _, rest = line.partition(b':')
+			parts = rest.split()
+			if parts:
+				value = int(parts[0])
+				out[key.decode()] = value * 1024 if len(parts) > 1 else value
+	return out
+
+
+def read_performance_info() -> Dict[str, int]:
+	"""System-wide counters from GetPerformanceInfo (Windows), in bytes."""
+	import ctypes
+	from ctypes import wintypes
+
+	class PERFORMANCE_INFORMATION(ctypes.Structure):
+		_fields_ = [
+			('cb', wintypes.DWORD),
+			('CommitTotal', ctypes.c_size_t),
+			('CommitLimit', ctypes.c_size_t),
+			('CommitPeak', ctypes.c_size_t),
+			('PhysicalTotal', ctypes.c_size_t),
+			('PhysicalAvailable', ctypes.c_size_t),
+			('SystemCache', ctypes.c_size_t),
+			('KernelTotal', ctypes.c_size_t),
+			('KernelPaged', ctypes.c_size_t),
+			('KernelNonpaged', ctypes.c_size_t),
+			('PageSize', ctypes.c_size_t),
+			('HandleCount', wintypes.DWORD),
+			('ProcessCount', wintypes.DWORD),
+			('ThreadCount', wintypes.DWORD),
+		]
+
+	info = PERFORMANCE_INFORMATION()
+	info.cb = ctypes.sizeof(info)
+	if not ctypes.windll.psapi.GetPerformanceInfo(ctypes.byref(info), info.cb):
+		raise OSError('GetPerformanceInfo failed')
+	page = info.PageSize
+	return {
+		'commit_total': info.CommitTotal * page,
+		'commit_limit': info.CommitLimit * page,
+		'system_cache': info.SystemCache * page,
+		'kernel_paged': info.KernelPaged * page,
+		'kernel_nonpaged': info.KernelNonpaged * page,
+		'handle_count': info.HandleCount,
+		'process_count': info.ProcessCount,
+	}
+
+
+def _process_table(attrs: List[str]) -> Callable[[], List[dict]]:
+	def fetch():
+		return [p.info for p in psutil.process_iter(['pid', 'name'] + attrs)]
+	return fetch
+
+
+def _process_uss() -> List[Tuple[int, str, int]]:
+	rows = []
+	for proc in psutil.process_iter(['pid', 'name']):
+		try:
+			rows.append((proc.info['pid'], proc.info['name'] or '', proc.memory_full_info().uss))
+		except Exception:
+			continue
+	return rows
+
+
+def _top(rows, key, n: int = TOP_N):
+	return sorted((r for r in rows if key(r) is not None), key=key, reverse=True)[:n]
+
+
+def default_registry(budget: float = 0.05, names: Optional[Iterable[str]] = None) -> MetricRegistry:
+	"""Registry with the standard metric tiers for this platform.
+
+	- cheap, 1 s: RAM and swap usage
+	- medium, 5 s: commit charge and cache size
+	- expensive, 15 s: per-process private bytes and handle counts
+	- expensive, 60 s: per-process USS
+
+	``names`` keeps only the listed collectors, so a consumer pays only for
+	the metrics it reads.
+	"""
+	reg = MetricRegistry(budget=budget)
+	reg.register_source('virtual_memory', psutil.virtual_memory)
+	reg.register_source('swap_memory', psutil.swap_memory)
+	reg.register(Collector('ram_percent', 'virtual_memory', lambda m: m.percent, 1.0, 'cheap'))
+	reg.register(Collector('ram_available', 'virtual_memory', lambda m: m.available, 1.0, 'cheap'))
+	reg.register(Collector('swap_percent', 'swap_memory', lambda s: s.percent, 1.0, 'cheap'))
+
+	if os.name == 'nt':
+		reg.register_source('perf_info', read_performance_info)
+		reg.register(Collector('commit', 'perf_info', lambda p: (p['commit_total'], p['commit_limit']), 5.0, 'medium'))
+		reg.register(Collector('system_cache', 'perf_info', lambda p: p['system_cache'], 5.0, 'medium'))
+		reg.register(Collector('handle_count', 'perf_info', lambda p: p['handle_count'], 5.0, 'medium'))
+		reg.register_source('processes', _process_table(['memory_info', 'num_handles']))
+		reg.register(Collector('top_private', 'processes', lambda rows: [(r['pid'], r['name'], r['memory_info'].private) for r in _top(rows, lambda r: r['memory_info'] and r['memory_info'].private)], 15.0, 'expensive'))
+		reg.register(Collector('top_handles', 'processes', lambda rows: [(r['pid'], r['name'], r['num_handles']) for r in _top(rows, lambda r: r['num_handles'])], 15.0, 'expensive'))
+	elif sys.platform.startswith('linux'):
+		reg.register_source('meminfo', read_meminfo)
+		reg.register(Collector('commit', 'meminfo', lambda m: (m['Committed_AS'], m['CommitLimit']), 5.0, 'medium'))
+		reg.register(Collector('system_cache', 'meminfo', lambda m: m['Cached'] + m.get('Buffers', 0), 5.0, 'medium'))
+		reg.register_source('processes', _process_table(['memory_info', 'num_fds']))
+		reg.register(Collector('top_private', 'processes', lambda rows: [(r['pid'], r['name'], r['memory_info'].rss - r['memory_info'].shared) for r in _top(rows, lambda r: r['memory_info'] and r['memory_info'].rss - r['memory_info'].shared)], 15.0, 'expensive'))
+		reg.register(Collector('top_handles', 'processes', lambda rows: [(r['pid'], r['name'], r['num_fds']) for r in _top(rows, lambda r: r['num_fds'])], 15.0, 'expensive'))
+
+	reg.register_source('process_uss', _process_uss)
+	reg.register(Collector('top_uss', 'process_uss', lambda rows: _top(rows, lambda r: r[2]), 60.0, 'expensive'))
+	if names is not None:
+		wanted = set(names)
+		reg.collectors = {name: c for name, c in reg.collectors.items() if name in wanted}
+	return reg
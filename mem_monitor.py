@@ -0,0 +1,358 @@
+"""Importable memory monitoring API.
+
+The GUI in ``mem_proccess.py`` is one consumer of this module; services can
+use it directly without pulling in DearPyGui or the tray code::
+
+	monitor = MemoryMonitor()
+	async for sample in monitor.samples(interval=0.5):
+		print(sample.ram_percent)
+
+Leaving the loop (``break``, an exception, cancellation) unsubscribes.
+``monitor.subscribe()`` returns the same stream as an explicit
+``Subscription`` for use with ``async with`` or ``close()``.
+
+All subscribers share a single background sampling thread, so adding
+consumers does not add psutil calls. The thread runs at the fastest interval
+any subscriber asked for and each subscription is downsampled to its own
+interval.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import threading
+import time
+from typing import AsyncIterator, Callable, NamedTuple, Optional
+
+import psutil
+
+from mem_cleanup import cleanup_memory
+
+
+MIN_INTERVAL = 0.05  # seconds; lower bound for the shared sampling loop
+HISTORY_SIZE = 600  # samples kept in MemoryMonitor.history
+
+
+class MemorySample(NamedTuple):
+	"""One system-wide memory reading. Sizes are in bytes."""
+	timestamp: float
+	ram_total: int
+	ram_used: int
+	ram_available: int
+	ram_percent: float
+	swap_total: int
+	swap_used: int
+	swap_percent: float
+
+
+def read_sample() -> MemorySample:
+	"""Take a single reading from psutil."""
+	mem = psutil.virtual_memory()
+	swap = psutil.swap_memory()
+	return MemorySample(
+		time.time(),
+		mem.total,
+		mem.used,
+		mem.available,
+		mem.percent,
+		swap.total,
+		swap.used,
+		swap.percent,
+	)
+
+
+# --- Auto-clean policy ---
+
+def threshold_due(percent: float, threshold: float, last_clean: float, now: float, cooldown: float) -> bool:
+	"""Return True if the threshold auto-clean should fire at ``now``."""
+	return bool(threshold) and percent >= threshold and now - last_clean >= cooldown
+
+
+def period_due(last_clean: float, now: float, period_minutes: float) -> bool:
+	"""Return True if the periodic auto-clean should fire at ``now``."""
+	return bool(period_minutes) and period_minutes > 0 and now - last_clean >= period_minutes * 60
+
+
+class AutoCleanPolicy:
+	"""Threshold and periodic auto-clean state, mirroring the GUI globals.
+
+	``evaluate`` takes the current time explicitly so the same logic can be
+	driven by a virtual clock.
+	"""
+
+	def __init__(self, threshold: float = 0, cooldown: float = 300.0, period_enabled: bool = False, period_minutes: float = 60):
+		self.threshold = threshold
+		self.cooldown = cooldown
+		self.period_enabled = period_enabled
+		self.period_minutes = period_minutes
+		self.last_auto_clean = 0.0
+		self.last_periodic_clean = 0.0
+
+	@classmethod
+	def from_config(cls, cfg: dict, cooldown: float = 300.0) -> 'AutoCleanPolicy':
+		return cls(
+			threshold=int(cfg.get('auto_clean_threshold', 0)) if cfg.get('auto_clean_enabled', False) else 0,
+			cooldown=cooldown,
+			period_enabled=bool(cfg.get('auto_clean_period_enabled', False)),
+			period_minutes=int(cfg.get('auto_clean_period_minutes', 60)),
+		)
+
+	def evaluate(self, percent: float, now: float) -> Optional[str]:
+		"""Return ``'threshold'``, ``'periodic'`` or None, updating the timers."""
+		if threshold_due(percent, self.threshold, self.last_auto_clean, now, self.cooldown):
+			self.last_auto_clean = now
+			return 'threshold'
+		if self.period_enabled and period_due(self.last_periodic_clean, now, self.period_minutes):
+			self.last_periodic_clean = now
+			return 'periodic'
+		return None
+
+
+# --- Subscriptions ---
+
+class Subscription:
+	"""A consumer of samples from a ``MemoryMonitor``.
+
+	Use it as an async iterator, or pass ``callback`` to ``MemoryMonitor.subscribe``
+	to receive samples on the sampling thread. Call ``close`` or use the
+	subscription as a (async) context manager to unsubscribe.
+	"""
+
+	def __init__(self, monitor: 'MemoryMonitor', interval: float, callback: Optional[Callable[[MemorySample], None]] = None, maxsize: int = 64):
+		self.monitor = monitor
+		self.interval = max(float(interval), MIN_INTERVAL)
+		self.callback = callback
+		self.maxsize = maxsize
+		self.closed = False
+		self.dropped = 0
+		self._last_delivered = 0.0
+		self._thresholds = []
+		self._loop: Optional[asyncio.AbstractEventLoop] = None
+		self._queue: Optional[asyncio.Queue] = None
+
+	def on_threshold(self, percent: float, callback: Callable[[MemorySample, str], None], field: str = 'ram_percent', hysteresis: float = 2.0) -> 'Subscription':
+		"""Call ``callback(sample, 'above'|'below')`` when ``field`` crosses ``percent``.
+
+		Thresholds are checked on every underlying sample, not only on the
+		downsampled ones. The 'below' event fires once the value drops under
+		``percent - hysteresis``.
+		"""
+		self._thresholds.append({'percent': percent, 'callback': callback, 'field': field, 'hysteresis': hysteresis, 'above': False})
+		return self
+
+	def close(self):
+		if self.closed:
+			return
+		self.closed = True
+		self.monitor._unsubscribe(self)
+		if self._loop is not None and self._queue is not None:
+			try:
+				self._loop.call_soon_threadsafe(self._put, None)
+			except RuntimeError:
+				pass  # loop already closed
+
+	def _check_thresholds(self, sample: MemorySample):
+		for th in self._thresholds:
+			value = getattr(sample, th['field'])
+			event = None
+			if not th['above'] and value >= th['percent']:
+				th['above'] = True
+				event = 'above'
+			elif th['above'] and value < th['percent'] - th['hysteresis']:
+				th['above'] = False
+				event = 'below'
+			if event:
+				try:
+					th['callback'](sample, event)
+				except Exception as e:
+					print(f'threshold callback error: {e}')
+
+	def _deliver(self, sample: MemorySample):
+		self._check_thresholds(sample)
+		# small slack so jitter in the shared loop does not skip a beat
+		if sample.timestamp - self._last_delivered < self.interval * 0.95:
+			return
+		self._last_delivered = sample.timestamp
+		if self.callback is not None:
+			try:
+				self.callback(sample)
+			except Exception as e:
+				print(f'subscriber callback error: {e}')
+		if self._loop is not None:
+			try:
+				self._loop.call_soon_threadsafe(self._put, sample)
+			except RuntimeError:
+				self.close()
+
+	def _put(self, sample: MemorySample):
+		# runs on the subscriber's event loop; drop the oldest sample if the consumer lags
+		if self._queue.full():
+			try:
+				self._queue.get_nowait()
+				self.dropped += 1
+			except asyncio.QueueEmpty:
+				pass
+		self._queue.put_nowait(sample)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	async def __aenter__(self):
+		return self.__aiter__()
+
+	async def __aexit__(self, *exc):
+		self.close()
+
+	def __aiter__(self):
+		if self._loop is None:
+			self._loop = asyncio.get_running_loop()
+			self._queue = asyncio.Queue(maxsize=self.maxsize)
+		return self
+
+	async def __anext__(self) -> MemorySample:
+		if self._queue is None:
+			self.__aiter__()
+		if self.closed and self._queue.empty():
+			raise StopAsyncIteration
+		sample = await self._queue.get()
+		if sample is None:
+			raise StopAsyncIteration
+		return sample
+
+
+class MemoryMonitor:
+	"""Shared sampler with subscriptions, history and programmatic cleanup.
+
+	``policy`` (an ``AutoCleanPolicy``) enables auto-clean on the sampling
+	thread while at least one subscriber is active.
+	"""
+
+	def __init__(self, sampler: Callable[[], MemorySample] = read_sample, policy: Optional[AutoCleanPolicy] = None, history_size: int = HISTORY_SIZE):
+		self.sampler = sampler
+		self.policy = policy
+		self.history = collections.deque(maxlen=history_size)
+		self._subs = []
+		self._lock = threading.Lock()
+		self._latest: Optional[MemorySample] = None
+		self._thread: Optional[threading.Thread] = None
+		self._interval = 0.0  # current period of the shared loop
+		self._wake = threading.Event()
+		self._cleanup_thread: Optional[threading.Thread] = None
+		self._cleanup_lock = threading.Lock()
+
+	# -- subscribing --
+
+	def subscribe(self, callback: Optional[Callable[[MemorySample], None]] = None, interval: float = 1.0, maxsize: int = 64) -> Subscription:
+		sub = Subscription(self, interval, callback, maxsize)
+		with self._lock:
+			self._subs.append(sub)
+			if self._thread is None or not self._thread.is_alive():
+				self._thread = threading.Thread(target=self._run, name='mem-monitor-sampler', daemon=True)
+				self._thread.start()
+		self._wake.set()  # re-evaluate the loop interval
+		return sub
+
+	async def samples(self, interval: float = 1.0, maxsize: int = 64) -> AsyncIterator[MemorySample]:
+		"""Async iterator of samples: ``async for s in monitor.samples(0.5)``.
+
+		The subscription is closed when iteration stops for any reason,
+		including ``break``.
+		"""
+		sub = self.subscribe(interval=interval, maxsize=maxsize)
+		try:
+			async for sample in sub:
+				yield sample
+		finally:
+			sub.close()
+
+	def _unsubscribe(self, sub: Subscription):
+		with self._lock:
+			try:
+				self._subs.remove(sub)
+			except ValueError:
+				pass
+		self._wake.set()
+
+	def close(self):
+		for sub in list(self._subs):
+			sub.close()
+
+	# -- sampling --
+
+	def _take(self) -> MemorySample:
+		sample = self.sampler()
+		self._latest = sample
+		self.history.append(sample)
+		return sample
+
+	def latest(self, max_age: float = 1.0) -> MemorySample:
+		"""Return the last sample if younger than ``max_age``, otherwise sample now.
+
+		While the shared loop is running its samples are used as long as they
+		are within two loop periods, so readers polling at the loop interval
+		do not add samples of their own (which would also land in
+		``history`` at irregular times).
+		"""
+		with self._lock:
+			sample = self._latest
+			if self._thread is not None:
+				max_age = max(max_age, 2 * self._interval)
+			if sample is None or time.time() - sample.timestamp > max_age:
+				sample = self._take()
+		return sample
+
+	def _run(self):
+		last = 0.0
+		while True:
+			with self._lock:
+				subs = list(self._subs)
+				if not subs:
+					self._thread = None
+					return
+				interval = self._interval = min(s.interval for s in subs)
+				# a wake-up (new subscriber, changed interval) only resamples when due
+				remaining = interval - (time.time() - last)
+				sample = self._take() if remaining <= 0 else None
+			if sample is None:
+				self._wake.wait(remaining)
+				self._wake.clear()
+				continue
+			last = sample.timestamp
+			for sub in subs:
+				if not sub.closed:
+					sub._deliver(sample)
+			if self.policy is not None:
+				try:
+					reason = self.policy.evaluate(sample.ram_percent, sample.timestamp)
+					if reason:
+						print(f'Auto-clean triggered ({reason}): mem {sample.ram_percent:.1f}%')
+						self.request_cleanup()
+				except Exception as e:
+					print(f'auto-clean policy error: {e}')
+			self._wake.wait(max(interval - (time.time() - last), 0.0))
+			self._wake.clear()
+
+	# -- cleanup --
+
+	def request_cleanup(self, wait: bool = False, timeout: Optional[float] = None) -> bool:
+		"""Run ``cleanup_memory`` in the background.
+
+		Returns False if a cleanup is already in progress. With ``wait=True``
+		blocks until the cleanup finishes (or ``timeout`` expires).
+		"""
+		with self._cleanup_lock:
+			if self._cleanup_thread is not None and self._cleanup_thread.is_alive():
+				return False
+			self._cleanup_thread = threading.Thread(target=cleanup_memory, name='mem-monitor-cleanup', daemon=True)
+			self._cleanup_thread.start()
+			thread = self._cleanup_thread
+		if wait:
+			thread.join(timeout)
+		return True
+
+	def cleanup_running(self) -> bool:
+		return self._cleanup_thread is not None and self._cleanup_thread.is_alive()
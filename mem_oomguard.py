@@ -0,0 +1,390 @@
+"""Early-OOM guard: a fast last-resort action under critical memory pressure.
+
+``cleanup_memory`` takes seconds, which is too slow once the machine is
+thrashing. ``OomGuard`` runs its own sampling thread (20 Hz by default). On
+Linux each tick re-reads the already open ``/proc/meminfo`` and
+``/proc/pressure/memory`` files; on Windows it calls
+``GlobalMemoryStatusEx``. When available memory drops below
+``available_percent``, or memory PSI ``full avg10`` rises above ``psi_full``,
+the guard suspends, terminates or kills the largest process or application
+that is not protected.
+
+The candidate ranking is refreshed in the background (``refresh_interval``),
+so at trigger time the guard only re-checks the chosen pid and acts. Every
+trigger is appended to a JSONL audit log, including in ``dry_run`` mode.
+
+Suspended processes are resumed once available memory is back above
+``resume_available_percent`` (and PSI is below half of ``psi_full``). They
+are also resumed when ``resume_suspended()`` is called or the guard stops.
+Each resume is audited too.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import psutil
+
+from mem_cleanup import PROTECTED_NAMES
+from mem_procscan import ProcInfo, get_backend
+from mem_proctree import SESSION_ROOTS, ProcessTree
+
+
+ACTIONS = ('suspend', 'terminate', 'kill')
+TARGETS = ('process', 'application')
+COMM_LEN = 15  # kernel comm length without the terminating NUL
+
+
+class _MemoryProbe:
+	"""Cheap reader of available memory (percent) and memory PSI."""
+
+	def __init__(self):
+		self._meminfo_fd = None
+		self._psi_fd = None
+		if sys.platform.startswith('linux'):
+			try:
+				self._meminfo_fd = os.open('/proc/meminfo', os.O_RDONLY)
+			except OSError:
+				pass
+			try:
+				self._psi_fd = os.open('/proc/pressure/memory', os.O_RDONLY)
+			except OSError:
+				pass
+		self._win_status = None
+		if os.name == 'nt':
+			self._win_status = self._make_win_status()
+
+	@staticmethod
+	def _make_win_status():
+		import ctypes
+		from ctypes import wintypes
+
+		class MEMORYSTATUSEX(ctypes.Structure):
+			_fields_ = [
+				('dwLength', wintypes.DWORD),
+				('dwMemoryLoad', wintypes.DWORD),
+				('ullTotalPhys', ctypes.c_ulonglong),
+				('ullAvailPhys', ctypes.c_ulonglong),
+				('ullTotalPageFile', ctypes.c_ulonglong),
+				('ullAvailPageFile', ctypes.c_ulonglong),
+				('ullTotalVirtual', ctypes.c_ulonglong),
+				('ullAvailVirtual', ctypes.c_ulonglong),
+				('ullAvailExtendedVirtual', ctypes.c_ulonglong),
+			]
+
+		status = MEMORYSTATUSEX()
+		status.dwLength = ctypes.sizeof(status)
+		fn = ctypes.windll.kernel32.GlobalMemoryStatusEx
+		ref = ctypes.byref(status)
+		return lambda: (fn(ref), status)[1]
+
+	def available_percent(self) -> float:
+		if self._meminfo_fd is not None:
+			data = os.pread(self._meminfo_fd, 4096, 0)
+			total = avail = None
+			for line in data.split(b'\n'):
+				if line.startswith(b'MemTotal:'):
+					total = int(line.split()[1])
+				elif line.startswith(b'MemAvailable:'):
+					avail = int(line.split()[1])
+					break
+			if total and avail is not None:
+				return avail * 100.0 / total
+		if self._win_status is not None:
+			st = self._win_status()
+			return st.ullAvailPhys * 100.0 / st.ullTotalPhys
+		mem = psutil.virtual_memory()
+		return mem.available * 100.0 / mem.total
+
+	def psi_full(self) -> Optional[float]:
+		"""``full avg10`` from /proc/pressure/memory, or None where unsupported."""
+		if self._psi_fd is None:
+			return None
+		for line in os.pread(self._psi_fd, 256, 0).split(b'\n'):
+			if line.startswith(b'full'):
+				return float(line.split()[1].split(b'=')[1])
+		return None
+
+	def close(self):
+		for fd in (self._meminfo_fd, self._psi_fd):
+			if fd is not None:
+				os.close(fd)
+		self._meminfo_fd = self._psi_fd = None
+
+
+class OomGuard:
+	"""Watches for critical memory pressure and acts on the largest candidate.
+
+	``protected`` adds process names (case-insensitive) to the built-in list:
+	``PROTECTED_NAMES``, session roots, this process, its parent and pid 1.
+	The procfs backend reports the kernel ``comm``, cut to 15 characters, so
+	with it names are compared in that truncated form.
+	``candidate_filter(pid, info)`` can further restrict who may be targeted,
+	for example to a test's own children.
+	"""
+
+	def __init__(
+		self,
+		available_percent: float = 3.0,
+		psi_full: Optional[float] = 40.0,
+		action: str = 'suspend',
+		target: str = 'process',
+		protected: Iterable[str] = (),
+		dry_run: bool = True,
+		audit_log: Optional[str] = None,
+		interval: float = 0.05,
+		refresh_interval: float = 1.0,
+		cooldown: float = 5.0,
+		candidate_filter: Optional[Callable[[int, ProcInfo], bool]] = None,
+		backend=None,
+		resume_available_percent: Optional[float] = 10.0,
+	):
+		if action not in ACTIONS:
+			raise ValueError(f'action must be one of {ACTIONS}')
+		if target not in TARGETS:
+			raise ValueError(f'target must be one of {TARGETS}')
+		self.available_percent = available_percent
+		self.psi_full = psi_full
+		self.action = action
+		self.target = target
+		self.backend = backend if backend is not None else get_backend()
+		self.protected = {n.lower() for n in PROTECTED_NAMES} | {n.lower() for n in SESSION_ROOTS} | {n.lower() for n in protected}
+		if self.backend.name == 'procfs':
+			self.protected |= {n[:COMM_LEN] for n in self.protected}
+		self.protected_pids = {0, 1, os.getpid(), os.getppid()}
+		self.dry_run = dry_run
+		self.audit_log = audit_log
+		self.interval = interval
+		self.refresh_interval = refresh_interval
+		self.cooldown = cooldown
+		self.candidate_filter = candidate_filter
+		self.resume_available_percent = resume_available_percent  # None: only resume on request
+		self.tree = ProcessTree(backend=self.backend)
+		self.events: List[dict] = []
+		self._probe = _MemoryProbe()
+		self._ranking: List[Tuple[int, List[Tuple[int, ProcInfo]]]] = []  # (rss, [(pid, info)]) largest first
+		self._last_action = 0.0
+		self._acted = set()  # (pid, create_time) already acted on; skipped until they exit
+		self._suspended: Dict[Tuple[int, float], str] = {}  # (pid, create_time) -> name
+		self._acted_lock = threading.Lock()  # _acted and _suspended are shared by both threads
+		self._stop = threading.Event()
+		self._threads: List[threading.Thread] = []
+		self._log_lock = threading.Lock()
+
+	# -- candidates --
+
+	def _protected(self, pid: int, info: ProcInfo) -> bool:
+		if pid in self.protected_pids or info.name.lower() in self.protected:
+			return True
+		return self.candidate_filter is not None and not self.candidate_filter(pid, info)
+
+	def _eligible(self, pid: int, info: ProcInfo) -> bool:
+		# rss 0: kernel threads and zombies
+		if info.rss <= 0:
+			return False
+		with self._acted_lock:
+			return (pid, info.create_time) not in self._acted
+
+	def _allowed(self, pid: int, info: ProcInfo) -> bool:
+		return self._eligible(pid, info) and not self._protected(pid, info)
+
+	def refresh_candidates(self):
+		"""Rebuild the ranking of targets; runs off the fast path."""
+		snap = self.backend.snapshot()
+		with self._acted_lock:
+			self._acted = {key for key in self._acted if key[0] in snap and snap[key[0]].create_time == key[1]}
+			self._suspended = {key: name for key, name in self._suspended.items() if key in self._acted}
+		ranking = []
+		if self.target == 'process':
+			for pid, info in snap.items():
+				if self._allowed(pid, info):
+					ranking.append((info.rss, [(pid, info)]))
+		else:
+			self.tree.update(snap)
+			with self.tree.lock:
+				for app in self.tree.apps.values():
+					members = [(pid, snap[pid]) for pid in app.members if pid in snap]
+					# an application with a protected member is left alone as a whole;
+					# zombies and members already acted on are just left out
+					if any(self._protected(pid, info) for pid, info in members):
+						continue
+					members = [(pid, info) for pid, info in members if self._eligible(pid, info)]
+					if members:
+						ranking.append((sum(info.rss for _, info in members), members))
+		ranking.sort(key=lambda r: r[0], reverse=True)
+		self._ranking = ranking
+
+	# -- acting --
+
+	def _same_process(self, pid: int, info: ProcInfo) -> bool:
+		try:
+			return abs(psutil.Process(pid).create_time() - info.create_time) < 1.0
+		except Exception:
+			return False
+
+	def _signal(self, pid: int, action: str):
+		if os.name == 'nt':
+			proc = psutil.Process(pid)
+			getattr(proc, action)()
+			return
+		sig = {'suspend': signal.SIGSTOP, 'resume': signal.SIGCONT, 'terminate': signal.SIGTERM, 'kill': signal.SIGKILL}[action]
+		os.kill(pid, sig)
+
+	def _act(self, reason: str, available: float, psi: Optional[float], detected: float) -> Optional[dict]:
+		for rss, members in self._ranking:
+			with self._acted_lock:
+				members = [(pid, info) for pid, info in members if (pid, info.create_time) not in self._acted]
+			members = [(pid, info) for pid, info in members if self._same_process(pid, info)]
+			if not members:
+				continue
+			results = {}
+			for pid, info in members:
+				key = (pid, info.create_time)
+				with self._acted_lock:
+					self._acted.add(key)
+				if self.dry_run:
+					results[pid] = 'dry-run'
+					continue
+				try:
+					self._signal(pid, self.action)
+					results[pid] = 'ok'
+					if self.action == 'suspend':
+						with self._acted_lock:
+							self._suspended[key] = info.name
+				except Exception as e:
+					results[pid] = f'error: {e}'
+			event = {
+				'time': time.time(),
+				'reason': reason,
+				'available_percent': round(available, 2),
+				'psi_full_avg10': psi,
+				'action': self.action,
+				'target': self.target,
+				'dry_run': self.dry_run,
+				'rss': rss,
+				'processes': [{'pid': pid, 'name': info.name, 'rss': info.rss, 'result': results[pid]} for pid, info in members],
+				'latency_ms': round((time.monotonic() - detected) * 1000.0, 2),
+			}
+			self._audit(event)
+			return event
+		self._audit({'time': time.time(), 'reason': reason, 'available_percent': round(available, 2), 'psi_full_avg10': psi, 'action': 'none', 'note': 'no eligible candidate'})
+		return None
+
+	def suspended(self) -> List[Tuple[int, str]]:
+		"""(pid, name) of the processes this guard has suspended."""
+		with self._acted_lock:
+			return [(key[0], name) for key, name in self._suspended.items()]
+
+	def resume_suspended(self, reason: str = 'requested') -> Optional[dict]:
+		"""Resume every process the guard suspended; returns the audit event."""
+		with self._acted_lock:
+			suspended, self._suspended = self._suspended, {}
+			# resumed processes may be chosen again under new pressure
+			self._acted -= set(suspended)
+		if not suspended:
+			return None
+		processes = []
+		for (pid, create_time), name in suspended.items():
+			if not self._same_process(pid, ProcInfo(0, name, 0, create_time)):
+				result = 'gone'
+			else:
+				try:
+					self._signal(pid, 'resume')
+					result = 'ok'
+				except Exception as e:
+					result = f'error: {e}'
+			processes.append({'pid': pid, 'name': name, 'result': result})
+		event = {'time': time.time(), 'reason': reason, 'action': 'resume', 'target': self.target, 'dry_run': False, 'processes': processes}
+		self._audit(event)
+		return event
+
+	def _audit(self, event: dict):
+		self.events.append(event)
+		names = ', '.join(f"{p['name']}[{p['pid']}]" for p in event.get('processes', []))
+		print(f"OOM guard: {event['reason']} -> {event['action']}{' (dry run)' if event.get('dry_run') else ''} {names}".rstrip())
+		if not self.audit_log:
+			return
+		try:
+			with self._log_lock, open(self.audit_log, 'a', encoding='utf-8') as f:
+				f.write(json.dumps(event, ensure_ascii=False) + '\n')
+		except Exception as e:
+			print(f'OOM guard audit log error: {e}')
+
+	def check(self) -> Optional[dict]:
+		"""One fast-path iteration; returns the audit event if the guard acted."""
+		detected = time.monotonic()
+		available = self._probe.available_percent()
+		psi = self._probe.psi_full()
+		reason = None
+		if available <= self.available_percent:
+			reason = f'available {available:.1f}% <= {self.available_percent}%'
+		elif psi is not None and self.psi_full is not None and psi >= self.psi_full:
+			reason = f'memory PSI full avg10 {psi:.1f} >= {self.psi_full}'
+		if reason is None:
+			if self._suspended and self._recovered(available, psi) and detected - self._last_action >= self.cooldown:
+				return self.resume_suspended(f'pressure cleared: available {available:.1f}%')
+			return None
+		if detected - self._last_action < self.cooldown:
+			return None
+		self._last_action = detected
+		return self._act(reason, available, psi, detected)
+
+	def _recovered(self, available: float, psi: Optional[float]) -> bool:
+		if self.resume_available_percent is None or available < self.resume_available_percent:
+			return False
+		return psi is None or self.psi_full is None or psi < self.psi_full / 2
+
+	# -- threads --
+
+	def _fast_loop(self):
+		while not self._stop.is_set():
+			try:
+				self.check()
+			except Exception as e:
+				print(f'OOM guard check error: {e}')
+			self._stop.wait(self.interval)
+
+	def _refresh_loop(self):
+		while not self._stop.is_set():
+			try:
+				self.refresh_candidates()
+			except Exception as e:
+				print(f'OOM guard refresh error: {e}')
+			self._stop.wait(self.refresh_interval)
+
+	def start(self):
+		self._stop.clear()
+		self.refresh_candidates()
+		self._threads = [
+			threading.Thread(target=self._fast_loop, name='oom-guard', daemon=True),
+			threading.Thread(target=self._refresh_loop, name='oom-guard-refresh', daemon=True),
+		]
+		for t in self._threads:
+			t.start()
+
+	def stop(self):
+		self._stop.set()
+		for t in self._threads:
+			t.join(timeout=2.0)
+		self._probe.close()
+		# never leave processes frozen behind
+		self.resume_suspended('guard stopped')
+
+	@classmethod
+	def from_config(cls, cfg: dict, audit_log: Optional[str] = None) -> 'OomGuard':
+		return cls(
+			available_percent=float(cfg.get('oom_guard_available_percent', 3.0)),
+			psi_full=cfg.get('oom_guard_psi_full', 40.0),
+			action=cfg.get('oom_guard_action', 'suspend'),
+			target=cfg.get('oom_guard_target', 'process'),
+			protected=cfg.get('oom_guard_protected', []),
+			dry_run=bool(cfg.get('oom_guard_dry_run', True)),
+			audit_log=audit_log,
+			resume_available_percent=cfg.get('oom_guard_resume_available_percent', 10.0),
+		)
@@ -21,19 +21,25 @@ import os
 import sys
 import threading
 import time
-import gc
-import subprocess
 
 import dearpygui.dearpygui as dpg
-import psutil
 import ctypes
 import winreg
 import pystray
 from PIL import Image, ImageDraw, ImageFont
 from ctypes import wintypes
 
+from mem_monitor import MemoryMonitor, threshold_due, period_due
+from mem_metrics import default_registry
+from mem_shm import SharedSampleReader, run_headless
+from mem_oomguard import OomGuard
+from mem_sinks import CallbackSink, SinkHub, build_sinks
+from mem_proctree import ProcessTree
+from mem_smaps import SmapsCache, smaps_available, summarize_by_kind
+
 # --- Configuration ---
 config_path = os.path.join(os.path.dirname(__file__), 'mem_proccess_config.json')
+oom_audit_path = os.path.join(os.path.dirname(__file__), 'mem_oom_audit.jsonl')
 
 # Auto-clean globals
 AUTO_CLEAN_THRESHOLD = 0
@@ -45,6 +51,22 @@ AUTO_CLEAN_PERIOD_ENABLED = False
 AUTO_CLEAN_PERIOD_MINUTES = 60
 LAST_PERIODIC_CLEAN = 0.0
 
+# Shared sampler; other in-process consumers should subscribe to this instance
+MONITOR = MemoryMonitor()
+# Process tree with per-application rollups, refreshed by process_tree_loop
+PROCESS_TREE = ProcessTree()
+PROCESS_TREE_INTERVAL = 3.0  # seconds
+# Memory region breakdowns for the Applications tab drill-down (Linux only)
+SMAPS = SmapsCache() if smaps_available() else None
+# Sample consumers other than the main window (tray icon, configured sinks)
+SINKS = SinkHub()
+# Tiered metrics; the GUI only collects the commit charge. Created in main()
+METRICS = None
+# Early-OOM guard, started in main() when enabled in the config
+OOM_GUARD = None
+# Set with --attach: samples and the top applications come from a headless instance
+SHM_READER = None
+
 
 def set_autostart(enable: bool) -> bool:
 	try:
@@ -65,117 +87,18 @@ def set_autostart(enable: bool) -> bool:
 		return False
 
 
-def cleanup_memory() -> bool:
-	try:
-		print('Starting aggressive memory cleanup...')
-		
-		# PowerShell aggressive cleanup routine
-		ps_command = """
-# Stage 1: Clear DNS and network caches
-Write-Host 'Stage 1: Clearing DNS cache...'
-try { ipconfig /flushdns 2>$null } catch {}
-
-# Stage 2: Flush file cache
-Write-Host 'Stage 2: Flushing file buffers...'
-try { Clear-DnsClientCache 2>$null } catch {}
-
-# Stage 3: Garbage collection in PowerShell
-Write-Host 'Stage 3: PowerShell GC...'
-[System.GC]::Collect()
-[System.GC]::WaitForPendingFinalizers()
-
-# Stage 4: Force cleanup of unused memory
-Write-Host 'Stage 4: Clearing standby memory...'
-try {
-    Get-Process | Where-Object { $_.ProcessName -notmatch 'svchost|csrss|lsass|System|dwm' } | ForEach-Object {
-        try {
-            $_.MinWorkingSet = $_.MinWorkingSet
-        } catch {}
-    }
-} catch {}
-
-# Stage 5: Additional cleanup
-Write-Host 'Stage 5: Final memory trim...'
-for ($i = 0; $i -lt 15; $i++) {
-    [System.GC]::Collect()
-    [System.GC]::WaitForPendingFinalizers()
-    Start-Sleep -Milliseconds 20
-}
-
-Write-Host 'Memory cleanup completed'
-"""
-		
-		try:
-			result = subprocess.run(
-				["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", ps_command],
-				capture_output=True,
-				timeout=30,
-				text=True,
-				creationflags=subprocess.CREATE_NO_WINDOW if hasattr(subprocess, 'CREATE_NO_WINDOW') else 0x08000000
-			)
-			output = result.stdout + result.stderr
-			for line in output.split('\n'):
-				if 'Stage' in line or 'cleanup' in line.lower() or 'completed' in line.lower():
-					print(line)
-		except Exception as e:
-			print(f'PowerShell cleanup error: {e}')
-		
-		# Python GC cleanup
-		print('Stage 6: Python garbage collection...')
-		for _ in range(10):
-			gc.collect()
-			time.sleep(0.05)
-		
-		# Aggressive Windows API cleanup
-		try:
-			kernel32 = ctypes.windll.kernel32
-			psapi = ctypes.windll.psapi
-			PROC_ALL = 0x1F0FFF
-			
-			print('Stage 7: API working set cleanup...')
-			for proc in psutil.process_iter(['pid', 'name']):
-				try:
-					pinfo = proc.as_dict(attrs=['pid', 'name'])
-					pname = (pinfo.get('name') or '').lower()
-					if pname in ['system', 'svchost.exe', 'csrss.exe', 'lsass.exe', 'python.exe', 'dwm.exe']:
-						continue
-					pid = pinfo.get('pid')
-					handle = kernel32.OpenProcess(PROC_ALL, False, pid)
-					if handle:
-						try:
-							psapi.EmptyWorkingSet(handle)
-						except Exception:
-							pass
-						try:
-							kernel32.SetProcessWorkingSetSize(handle, -1, -1)
-						except Exception:
-							pass
-						kernel32.CloseHandle(handle)
-				except Exception:
-					continue
-		except Exception as e:
-			print(f'API cleanup error: {e}')
-		
-		time.sleep(1)
-		mem = psutil.virtual_memory()
-		print(f'Memory cleanup finished - Current memory usage: {mem.percent:.1f}%')
-		return True
-		
-	except Exception as e:
-		print(f'Cleanup error: {e}')
-		return False
-
-
 def save_config(autostart: bool, theme: str = 'blue', auto_clean_enabled: bool = False, auto_clean_threshold: int = 0, auto_clean_period_enabled: bool = False, auto_clean_period_minutes: int = 60):
 	try:
-		data = {
+		# keep keys not managed by the GUI (e.g. metrics_budget_ms)
+		data = load_config()
+		data.update({
 			'autostart': bool(autostart),
 			'theme': str(theme),
 			'auto_clean_enabled': bool(auto_clean_enabled),
 			'auto_clean_threshold': int(auto_clean_threshold),
 			'auto_clean_period_enabled': bool(auto_clean_period_enabled),
 			'auto_clean_period_minutes': int(auto_clean_period_minutes)
-		}
+		})
 		with open(config_path, 'w', encoding='utf-8') as f:
 			json.dump(data, f, ensure_ascii=False, indent=2)
 	except Exception as e:
@@ -190,6 +113,16 @@ def load_config() -> dict:
 		'auto_clean_threshold': 0,
 		'auto_clean_period_enabled': False,
 		'auto_clean_period_minutes': 60,
+		'metrics_budget_ms': 50,  # collection time allowed per second
+		'oom_guard_enabled': False,
+		'oom_guard_available_percent': 3,
+		'oom_guard_psi_full': 40,
+		'oom_guard_action': 'suspend',  # suspend | terminate | kill
+		'oom_guard_target': 'process',  # process | application
+		'oom_guard_protected': [],
+		'oom_guard_dry_run': True,
+		'oom_guard_resume_available_percent': 10,  # resume suspended processes above this
+		'sinks': [],  # see mem_sinks, e.g. {"type": "jsonl", "path": "mem_trace.jsonl"}
 	}
 	try:
 		if os.path.exists(config_path):
@@ -302,31 +235,53 @@ def apply_theme(theme_name: str, themes: dict):
 		print(f'apply_theme error: {e}')
 
 
+def update_tray_icon(sample):
+	"""Redraw the tray icon; runs on its own sink thread (see SINKS)."""
+	if '_GLOBAL_TRAY_ICON' in globals() and _GLOBAL_TRAY_ICON:
+		try:
+			img = create_tray_icon(sample.ram_percent)
+			_GLOBAL_TRAY_ICON.icon = img
+			try:
+				# some pystray backends expose update_icon
+				_GLOBAL_TRAY_ICON.update_icon()
+			except Exception:
+				pass
+		except Exception:
+			pass
+
+
 def update_loop(stop_event: threading.Event):
 	global AUTO_CLEAN_ENABLED, AUTO_CLEAN_THRESHOLD, LAST_AUTO_CLEAN, AUTO_CLEAN_COOLDOWN, AUTO_CLEAN_PERIOD_ENABLED, AUTO_CLEAN_PERIOD_MINUTES, LAST_PERIODIC_CLEAN
+	# keeps MONITOR's shared loop running; latest() then reuses its samples
+	subscription = MONITOR.subscribe(interval=1.0)
 	while not stop_event.is_set():
 		try:
-			mem = psutil.virtual_memory()
-			swap = psutil.swap_memory()
-			ram_text = f"Physical Memory: {mem.used / (1024**3):.2f} GB / {mem.total / (1024**3):.2f} GB ({mem.percent:.1f}%)"
-			swap_text = f"Paging File: {swap.used / (1024**3):.2f} GB / {swap.total / (1024**3):.2f} GB ({swap.percent:.1f}%)"
-			ram_val = min(mem.percent / 100.0, 1.0)
-			swap_val = min(swap.percent / 100.0, 1.0)
+			sample = MONITOR.latest(max_age=2.0)
+			ram_text = f"Physical Memory: {sample.ram_used / (1024**3):.2f} GB / {sample.ram_total / (1024**3):.2f} GB ({sample.ram_percent:.1f}%)"
+			swap_text = f"Paging File: {sample.swap_used / (1024**3):.2f} GB / {sample.swap_total / (1024**3):.2f} GB ({sample.swap_percent:.1f}%)"
+			ram_val = min(sample.ram_percent / 100.0, 1.0)
+			swap_val = min(sample.swap_percent / 100.0, 1.0)
 			try:
 				dpg.set_value('ram_text', ram_text)
 				dpg.set_value('swap_text', swap_text)
 				dpg.set_value('ram_bar', ram_val)
 				dpg.set_value('swap_bar', swap_val)
+				# commit charge is collected on a slower tier; hide it when stale
+				commit = METRICS.get('commit', max_age=15.0) if METRICS else None
+				if commit:
+					dpg.set_value('commit_text', f"Commit Charge: {commit[0] / (1024**3):.2f} GB / {commit[1] / (1024**3):.2f} GB")
+				else:
+					dpg.set_value('commit_text', '')
 				# Set text color based on thresholds: >=80% red, >=60% orange, otherwise muted gray
 				ram_color = (180, 180, 180)
-				if mem.percent >= 80:
+				if sample.ram_percent >= 80:
 					ram_color = (200, 60, 60)
-				elif mem.percent >= 60:
+				elif sample.ram_percent >= 60:
 					ram_color = (230, 130, 40)
 				swap_color = (180, 180, 180)
-				if swap.percent >= 80:
+				if sample.swap_percent >= 80:
 					swap_color = (200, 60, 60)
-				elif swap.percent >= 60:
+				elif sample.swap_percent >= 60:
 					swap_color = (230, 130, 40)
 				try:
 					if dpg.does_item_exist('ram_text'):
@@ -337,21 +292,6 @@ def update_loop(stop_event: threading.Event):
 					pass
 			except Exception:
 				pass
-			# update tray icon image if available
-			try:
-				if '_GLOBAL_TRAY_ICON' in globals() and _GLOBAL_TRAY_ICON:
-					try:
-						img = create_tray_icon(mem.percent)
-						_GLOBAL_TRAY_ICON.icon = img
-						try:
-							# some pystray backends expose update_icon
-							_GLOBAL_TRAY_ICON.update_icon()
-						except Exception:
-							pass
-					except Exception:
-						pass
-			except Exception:
-				pass
 			# Also update stored config values for threshold auto-clean if changed in GUI
 			try:
 				if dpg.does_item_exist('autoclean_threshold_combo'):
@@ -375,14 +315,14 @@ def update_loop(stop_event: threading.Event):
 
 		# Automatic cleaning if enabled and threshold reached (with cooldown)
 		try:
-			if AUTO_CLEAN_ENABLED and AUTO_CLEAN_THRESHOLD and mem.percent >= AUTO_CLEAN_THRESHOLD:
-				now = time.time()
-				if now - LAST_AUTO_CLEAN >= AUTO_CLEAN_COOLDOWN:
-					print(f"Auto-clean triggered: mem {mem.percent:.1f}% >= {AUTO_CLEAN_THRESHOLD}%")
-					threading.Thread(target=cleanup_memory, daemon=True).start()
-					LAST_AUTO_CLEAN = now
+			now = time.time()
+			if AUTO_CLEAN_ENABLED and threshold_due(sample.ram_percent, AUTO_CLEAN_THRESHOLD, LAST_AUTO_CLEAN, now, AUTO_CLEAN_COOLDOWN):
+				print(f"Auto-clean triggered: mem {sample.ram_percent:.1f}% >= {AUTO_CLEAN_THRESHOLD}%")
+				MONITOR.request_cleanup()
+				LAST_AUTO_CLEAN = now
 		except Exception:
 			pass
+	subscription.close()
 
 
 # Global tray icon instance
@@ -518,7 +458,7 @@ def on_tray_show(icon, item):
 
 def on_tray_cleanup(icon, item):
 	"""Clear memory from tray menu"""
-	threading.Thread(target=cleanup_memory, daemon=True).start()
+	MONITOR.request_cleanup()
 
 
 def on_tray_set_auto_clean(icon, item, threshold):
@@ -580,8 +520,8 @@ def on_tray_exit(icon, item):
 def setup_tray():
 	"""Setup system tray icon"""
 	try:
-		mem = psutil.virtual_memory()
-		icon_img = create_tray_icon(mem.percent)
+		sample = MONITOR.latest(max_age=1.0)
+		icon_img = create_tray_icon(sample.ram_percent)
 		# Build auto-clean submenu (50..100 step 5) with Off option.
 		# If submenu construction fails for any backend, fall back to a simple menu.
 		try:
@@ -626,12 +566,118 @@ def run_tray(tray_icon):
 		print(f'Tray run error: {e}')
 
 
+def process_tree_loop(stop_event: threading.Event):
+	"""Keep PROCESS_TREE up to date in the background."""
+	while not stop_event.is_set():
+		try:
+			PROCESS_TREE.refresh()
+		except Exception as e:
+			print(f'process_tree_loop error: {e}')
+		stop_event.wait(PROCESS_TREE_INTERVAL)
+
+
+def _add_process_node(pid: int, app_root: int, parent):
+	"""Render one process and its same-application children as tree nodes."""
+	node = PROCESS_TREE.nodes.get(pid)
+	if node is None:
+		return
+	label = f"{node.name} [{pid}]  {node.rss / (1024**2):.0f} MB"
+	children = sorted(
+		(c for c in node.children if c in PROCESS_TREE.nodes and PROCESS_TREE.nodes[c].app == app_root),
+		key=lambda c: PROCESS_TREE.nodes[c].rss,
+		reverse=True,
+	)
+	if not children:
+		with dpg.group(horizontal=True, parent=parent):
+			dpg.add_text(label)
+			if SMAPS is not None:
+				dpg.add_button(label='Regions', small=True, user_data=pid, callback=lambda s, a, u: show_regions(u))
+		return
+	with dpg.tree_node(label=f"{label}  (+{PROCESS_TREE.subtree_rss(pid) / (1024**2):.0f} MB total)", parent=parent):
+		if SMAPS is not None:
+			dpg.add_button(label='Regions', small=True, user_data=pid, callback=lambda s, a, u: show_regions(u))
+		for child in children:
+			_add_process_node(child, app_root, dpg.last_container())
+
+
+def _render_shared_top(limit: int):
+	"""Applications tab contents from the headless instance's top table."""
+	snap = SHM_READER.snapshot()
+	if snap is None or not snap.top:
+		dpg.add_text('No application data from the headless instance yet', parent='apps_group')
+		return
+	for row in snap.top[:limit]:
+		with dpg.group(horizontal=True, parent='apps_group'):
+			dpg.add_text(f"{row.name}  {row.rss / (1024**2):.0f} MB  ({row.count} proc)  [{row.pid}]")
+			if SMAPS is not None and row.pid:
+				dpg.add_button(label='Regions', small=True, user_data=row.pid, callback=lambda s, a, u: show_regions(u))
+
+
+def render_process_tree(limit: int = 15):
+	"""Rebuild the collapsible application tree in the Applications tab."""
+	try:
+		if not dpg.does_item_exist('apps_group'):
+			return
+		dpg.delete_item('apps_group', children_only=True)
+		if SHM_READER is not None:
+			_render_shared_top(limit)
+			return
+		with PROCESS_TREE.lock:
+			for app in PROCESS_TREE.top_apps(limit):
+				label = f"{app.name}  {app.rss / (1024**2):.0f} MB  ({len(app.members)} proc)"
+				with dpg.tree_node(label=label, parent='apps_group'):
+					container = dpg.last_container()
+					dpg.add_button(label='Trim application', parent=container, user_data=app.root, callback=lambda s, a, u: threading.Thread(target=PROCESS_TREE.trim_app, args=(u,), daemon=True).start())
+					for root in PROCESS_TREE.app_roots(app):
+						_add_process_node(root, app.root, container)
+	except Exception as e:
+		print(f'render_process_tree error: {e}')
+
+
+def show_regions(pid: int):
+	"""Fill the Applications tab drill-down with the memory regions of ``pid``."""
+	def work():
+		try:
+			dpg.set_value('regions_title', f'Memory regions of PID {pid}: reading...')
+			b = SMAPS.breakdown(pid)
+			mb = 1024 ** 2
+			dpg.delete_item('regions_group', children_only=True)
+			title = f'Memory regions of PID {pid}: {b.mappings} mappings'
+			if b.rollup:
+				title += f"  (RSS {b.rollup.get('Rss', 0) / mb:.0f} MB, PSS {b.rollup.get('Pss', 0) / mb:.0f} MB, swap {b.rollup.get('Swap', 0) / mb:.0f} MB)"
+			dpg.set_value('regions_title', title)
+			with dpg.table(parent='regions_group', header_row=True, borders_innerH=True, policy=dpg.mvTable_SizingStretchProp):
+				for column in ('Kind / file', 'Maps', 'RSS MB', 'PSS MB', 'Swap MB'):
+					dpg.add_table_column(label=column)
+				for kind in summarize_by_kind(b.groups):
+					rows = [kind] + [g for g in b.groups if g.kind == kind.kind and g.backing][:5]
+					for g in rows:
+						with dpg.table_row():
+							dpg.add_text(g.kind if g is kind else f'    {g.backing}')
+							dpg.add_text(str(g.count))
+							dpg.add_text(f'{g.rss / mb:.1f}')
+							dpg.add_text(f'{g.pss / mb:.1f}')
+							dpg.add_text(f'{g.swap / mb:.1f}')
+		except Exception as e:
+			dpg.set_value('regions_title', f'Memory regions of PID {pid}: unavailable ({e})')
+	threading.Thread(target=work, daemon=True).start()
+
+
 def open_settings():
 	"""Open settings window"""
 	dpg.configure_item('settings_tab', show=True)
 
 
-def main():
+def main(attach: bool = False):
+	"""Run the GUI. With ``attach`` memory samples and the top applications
+	are read from a running headless instance (see ``mem_shm``) instead of
+	being collected here."""
+	global SHM_READER
+	if attach:
+		SHM_READER = SharedSampleReader()
+		MONITOR.sampler = SHM_READER.sampler()
+		print('Attached to shared sample segment' if SHM_READER.is_live() else 'No live headless instance yet; sampling locally until one appears')
+
 	dpg.create_context()
 	
 	# Load config and create themes
@@ -690,12 +736,14 @@ def main():
 				dpg.add_spacer(height=8)
 				dpg.add_text('', tag='swap_text', color=(180, 180, 180))
 				dpg.add_progress_bar(tag='swap_bar', width=440, default_value=0.0)
-				dpg.add_spacer(height=12)
+				dpg.add_spacer(height=4)
+				dpg.add_text('', tag='commit_text', color=(160, 160, 160))
+				dpg.add_spacer(height=4)
 				
 				# Clear Memory button
 				with dpg.group(horizontal=True):
 					dpg.add_spacer(width=130)
-					dpg.add_button(label='Clear Memory', width=180, height=32, callback=lambda: threading.Thread(target=cleanup_memory, daemon=True).start())
+					dpg.add_button(label='Clear Memory', width=180, height=32, callback=lambda: MONITOR.request_cleanup())
 				
 				# License text
 				dpg.add_spacer(height=6)
@@ -720,7 +768,20 @@ def main():
 				dpg.add_text('Periodic auto-clean', color=(200,200,200))
 				dpg.add_checkbox(label='Enable periodic auto-clean', tag='autoclean_periodic_enable', default_value=cfg.get('auto_clean_period_enabled', False), callback=lambda s, v: None)
 				dpg.add_input_int(label='Interval (minutes)', tag='autoclean_period_minutes', default_value=cfg.get('auto_clean_period_minutes', 60), min_value=1, max_value=1440, width=120)
-				dpg.add_button(label='Run periodic now', width=140, callback=lambda: threading.Thread(target=cleanup_memory, daemon=True).start())
+				dpg.add_button(label='Run periodic now', width=140, callback=lambda: MONITOR.request_cleanup())
+				if cfg.get('oom_guard_enabled', False):
+					dpg.add_spacer(height=8)
+					dpg.add_text('OOM guard', color=(200, 200, 200))
+					dpg.add_button(label='Resume suspended processes', width=220, callback=lambda: OOM_GUARD.resume_suspended('user request') if OOM_GUARD else None)
+			
+			with dpg.tab(label='Applications', tag='apps_tab'):
+				dpg.add_spacer(height=5)
+				dpg.add_button(label='Refresh', width=120, callback=lambda: render_process_tree())
+				dpg.add_group(tag='apps_group')
+				if SMAPS is not None:
+					dpg.add_separator()
+					dpg.add_text('Memory regions: press "Regions" next to a process', tag='regions_title', color=(200, 200, 200))
+					dpg.add_group(tag='regions_group')
 			
 			with dpg.tab(label='Style', tag='style_tab'):
 				dpg.add_spacer(height=10)
@@ -819,6 +880,12 @@ def main():
 	tray_starter.start()
 	print('DEBUG: tray starter thread started')
 
+	SINKS.add(CallbackSink(update_tray_icon, name='tray', overflow='latest'))
+	for sink in build_sinks(cfg.get('sinks', [])):
+		SINKS.add(sink)
+	SINKS.attach(MONITOR, interval=1.0)
+	print(f'DEBUG: {len(SINKS.sinks)} sample sinks attached')
+
 	stop_event = threading.Event()
 	t = threading.Thread(target=update_loop, args=(stop_event,), daemon=True)
 	t.start()
@@ -829,12 +896,11 @@ def main():
 		global AUTO_CLEAN_PERIOD_ENABLED, AUTO_CLEAN_PERIOD_MINUTES, LAST_PERIODIC_CLEAN
 		while not stop_event.is_set():
 			try:
-				if AUTO_CLEAN_PERIOD_ENABLED and AUTO_CLEAN_PERIOD_MINUTES and AUTO_CLEAN_PERIOD_MINUTES > 0:
-					now = time.time()
-					if now - LAST_PERIODIC_CLEAN >= (AUTO_CLEAN_PERIOD_MINUTES * 60):
-						print(f'Periodic auto-clean triggered (every {AUTO_CLEAN_PERIOD_MINUTES} min)')
-						threading.Thread(target=cleanup_memory, daemon=True).start()
-						LAST_PERIODIC_CLEAN = now
+				now = time.time()
+				if AUTO_CLEAN_PERIOD_ENABLED and period_due(LAST_PERIODIC_CLEAN, now, AUTO_CLEAN_PERIOD_MINUTES):
+					print(f'Periodic auto-clean triggered (every {AUTO_CLEAN_PERIOD_MINUTES} min)')
+					MONITOR.request_cleanup()
+					LAST_PERIODIC_CLEAN = now
 			except Exception:
 				pass
 			stop_event.wait(5.0)
@@ -843,11 +909,38 @@ def main():
 	periodic_thread.start()
 	print('DEBUG: periodic_clean_loop thread started')
 
+	# the headless instance already walks the process list; don't do it twice
+	if SHM_READER is None:
+		tree_thread = threading.Thread(target=process_tree_loop, args=(stop_event,), daemon=True)
+		tree_thread.start()
+		print('DEBUG: process_tree_loop thread started')
+
+		global METRICS
+		# RAM and swap come from MONITOR; only the commit charge is read from here
+		METRICS = default_registry(budget=cfg.get('metrics_budget_ms', 50) / 1000.0, names=['commit'])
+		metrics_thread = threading.Thread(target=METRICS.run, args=(stop_event,), daemon=True)
+		metrics_thread.start()
+		print('DEBUG: metrics thread started')
+
+	global OOM_GUARD
+	if cfg.get('oom_guard_enabled', False):
+		try:
+			OOM_GUARD = OomGuard.from_config(cfg, audit_log=oom_audit_path)
+			OOM_GUARD.start()
+			print(f"DEBUG: OOM guard started (action={OOM_GUARD.action}, dry_run={OOM_GUARD.dry_run})")
+		except Exception as e:
+			print(f'OOM guard start error: {e}')
+
 	print('DEBUG: starting DearPyGui main loop')
 	dpg.start_dearpygui()
 
 	# Cleanup on exit
 	stop_event.set()
+	if OOM_GUARD is not None:
+		OOM_GUARD.stop()  # also resumes anything it suspended
+	SINKS.close()
+	if SHM_READER is not None:
+		SHM_READER.close()
 	theme = dpg.get_value('theme_radio').lower() if dpg.does_item_exist('theme_radio') else cfg.get('theme', 'blue')
 	autostart = dpg.get_value('autostart_checkbox') if dpg.does_item_exist('autostart_checkbox') else False
 	save_config(autostart, theme)
@@ -855,4 +948,7 @@ def main():
 
 
 if __name__ == '__main__':
-	main()
+	if '--headless' in sys.argv:
+		run_headless()
+	else:
+		main(attach='--attach' in sys.argv)
@@ -0,0 +1,239 @@
+"""Incrementally maintained process tree with per-application memory rollups.
+
+Browsers, IDEs and services run as many processes; this module groups them
+into applications so they can be shown, alerted on and cleaned as a unit.
+
+An application is rooted at the process directly below a session root
+(``explorer.exe``, ``services.exe``, ``systemd``, ...) or at a process
+whose parent is gone. Every descendant belongs to the application of its
+root. Rollups per application and per executable name are kept up to date
+from the differences between two snapshots (starts, exits, RSS changes)
+rather than being recomputed every tick.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from mem_cleanup import trim_working_sets
+from mem_procscan import ProcInfo, get_backend
+
+
+# Processes whose children are treated as separate applications
+SESSION_ROOTS = {
+	'system', 'system idle process', 'smss.exe', 'wininit.exe', 'winlogon.exe',
+	'services.exe', 'svchost.exe', 'explorer.exe', 'userinit.exe',
+	'systemd', 'init', 'kthreadd', 'launchd', 'sshd', 'login',
+}
+
+
+class Node:
+	__slots__ = ('pid', 'ppid', 'name', 'rss', 'create_time', 'app', 'children')
+
+	def __init__(self, pid: int, info: ProcInfo):
+		self.pid = pid
+		self.ppid = info.ppid
+		self.name = info.name
+		self.rss = info.rss
+		self.create_time = info.create_time
+		self.app = pid
+		self.children = set()
+
+
+class App:
+	"""Rollup of one application.
+
+	``root`` may have exited while members remain; if its pid is then reused
+	the application is re-keyed under a negative number.
+	"""
+	__slots__ = ('root', 'name', 'rss', 'members')
+
+	def __init__(self, root: int, name: str):
+		self.root = root
+		self.name = name
+		self.rss = 0
+		self.members = set()
+
+
+def snapshot_processes() -> Dict[int, ProcInfo]:
+	"""Read pid -> ProcInfo for every visible process using the default backend."""
+	return get_backend().snapshot()
+
+
+class ProcessTree:
+	"""Parent/child tree plus application and executable rollups.
+
+	Call ``refresh`` (or ``update`` with successive snapshots from a
+	``mem_procscan`` backend); both return the number of started and exited
+	processes. Code walking ``nodes``/``apps`` directly should hold ``lock``.
+	"""
+
+	def __init__(self, session_roots=SESSION_ROOTS, backend=None):
+		self.backend = backend if backend is not None else get_backend()
+		self.session_roots = {n.lower() for n in session_roots}
+		self.nodes: Dict[int, Node] = {}
+		self.apps: Dict[int, App] = {}
+		self.exe_rss: Dict[str, int] = {}
+		self.exe_count: Dict[str, int] = {}
+		self.lock = threading.RLock()
+		self._alerts = []
+		self._stale_key = 0
+
+	# -- incremental maintenance --
+
+	def update(self, snapshot: Dict[int, ProcInfo]):
+		with self.lock:
+			started = []
+			exited = [pid for pid in self.nodes if pid not in snapshot]
+			for pid, info in snapshot.items():
+				node = self.nodes.get(pid)
+				if node is None:
+					started.append(pid)
+				elif node.create_time != info.create_time:
+					# pid was reused by a new process
+					exited.append(pid)
+					started.append(pid)
+				elif node.rss != info.rss:
+					self._add_rss(node, info.rss - node.rss)
+					node.rss = info.rss
+			for pid in exited:
+				self._remove(pid)
+			# parents first so children find their application root
+			started.sort(key=lambda p: snapshot[p].create_time)
+			for pid in started:
+				self._add(pid, snapshot[pid])
+			self._check_alerts()
+			return len(started), len(exited)
+
+	def _add_rss(self, node: Node, delta: int):
+		self.apps[node.app].rss += delta
+		self.exe_rss[node.name] = self.exe_rss.get(node.name, 0) + delta
+
+	def _add(self, pid: int, info: ProcInfo):
+		node = Node(pid, info)
+		self.nodes[pid] = node
+		parent = self.nodes.get(info.ppid) if info.ppid != pid else None
+		if parent is not None:
+			parent.children.add(pid)
+		if parent is None or parent.name.lower() in self.session_roots or node.name.lower() in self.session_roots:
+			node.app = pid
+		else:
+			node.app = parent.app
+		app = self.apps.get(node.app)
+		if app is not None and node.app == pid:
+			# a reused pid starts a new application while the old one still
+			# has members; move the old one out of the way
+			self._stale_key -= 1
+			app.root = self._stale_key
+			self.apps[app.root] = app
+			for member in app.members:
+				self.nodes[member].app = app.root
+			app = None
+		if app is None:
+			app = self.apps[node.app] = App(node.app, node.name)
+		app.members.add(pid)
+		self.exe_count[node.name] = self.exe_count.get(node.name, 0) + 1
+		self._add_rss(node, node.rss)
+
+	def _remove(self, pid: int):
+		node = self.nodes.pop(pid, None)
+		if node is None:
+			return
+		self._add_rss(node, -node.rss)
+		parent = self.nodes.get(node.ppid)
+		if parent is not None:
+			parent.children.discard(pid)
+		app = self.apps.get(node.app)
+		if app is not None:
+			app.members.discard(pid)
+			if not app.members:
+				del self.apps[node.app]
+		count = self.exe_count.get(node.name, 0) - 1
+		if count > 0:
+			self.exe_count[node.name] = count
+		else:
+			self.exe_count.pop(node.name, None)
+			self.exe_rss.pop(node.name, None)
+
+	def refresh(self):
+		return self.update(self.backend.snapshot())
+
+	# -- queries --
+
+	def top_apps(self, n: int = 10) -> List[App]:
+		with self.lock:
+			return sorted(self.apps.values(), key=lambda a: a.rss, reverse=True)[:n]
+
+	def top_executables(self, n: int = 10):
+		with self.lock:
+			return sorted(self.exe_rss.items(), key=lambda kv: kv[1], reverse=True)[:n]
+
+	def app_pids(self, root: int) -> List[int]:
+		with self.lock:
+			app = self.apps.get(root)
+			return sorted(app.members) if app else []
+
+	def app_processes(self, root: int) -> List[Tuple[int, float]]:
+		"""``(pid, create_time)`` of each member, to tell reused pids apart later."""
+		with self.lock:
+			app = self.apps.get(root)
+			return sorted((pid, self.nodes[pid].create_time) for pid in app.members) if app else []
+
+	def app_of(self, pid: int) -> Optional[App]:
+		with self.lock:
+			node = self.nodes.get(pid)
+			return self.apps.get(node.app) if node else None
+
+	def subtree_rss(self, pid: int) -> int:
+		with self.lock:
+			total = 0
+			stack = [pid]
+			while stack:
+				node = self.nodes.get(stack.pop())
+				if node is not None:
+					total += node.rss
+					stack.extend(node.children)
+			return total
+
+	def app_roots(self, app: App) -> List[int]:
+		"""Members of ``app`` whose parent is not in the same application."""
+		with self.lock:
+			roots = []
+			for pid in app.members:
+				parent = self.nodes.get(self.nodes[pid].ppid)
+				if parent is None or parent.app != app.root or parent.pid == pid:
+					roots.append(pid)
+			return sorted(roots)
+
+	# -- application-level policies --
+
+	def on_app_threshold(self, rss_bytes: int, callback: Callable[[App, str], None], hysteresis: float = 0.9):
+		"""Call ``callback(app, 'above'|'below')`` when an application's RSS crosses ``rss_bytes``."""
+		self._alerts.append({'limit': rss_bytes, 'callback': callback, 'hysteresis': hysteresis, 'above': set()})
+
+	def _check_alerts(self):
+		for alert in self._alerts:
+			above = alert['above']
+			for root in list(above):
+				if root not in self.apps:
+					above.discard(root)
+			for root, app in self.apps.items():
+				event = None
+				if root not in above and app.rss >= alert['limit']:
+					above.add(root)
+					event = 'above'
+				elif root in above and app.rss < alert['limit'] * alert['hysteresis']:
+					above.discard(root)
+					event = 'below'
+				if event:
+					try:
+						alert['callback'](app, event)
+					except Exception as e:
+						print(f'app alert callback error: {e}')
+
+	def trim_app(self, root: int):
+		"""Trim the working set of every process of one application; returns a ``TrimReport``."""
+		report = trim_working_sets(self.app_processes(root))
+		print(f'Trim application {root}: {report.summary()}')
+		return report
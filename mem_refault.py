@@ -0,0 +1,306 @@
+"""Refault accounting for working-set trims.
+
+Trimming a process that is in active use only makes it fault its pages back
+in. ``RefaultTracker`` helps decide whom to trim and whether it was worth it:
+
+1. ``select(targets)`` samples every candidate twice, ``probe`` seconds
+   apart. Processes using more than ``busy_cpu`` of a core, or whose last
+   trim did more harm than good (for ``penalty`` seconds), are deferred.
+   The same probe gives each process its normal fault and read rates.
+2. ``before(pid)`` / ``after(pid, name, status)`` are called by
+   ``ParallelTrimmer`` around each trim call. The difference in RSS is the
+   memory freed.
+3. ``window`` seconds later, ``poll()`` samples the process again. Faults and
+   bytes read above the normal rate are the refault cost; RSS that came back
+   is subtracted from what was freed. The ``net`` benefit is the memory that
+   stayed free minus the bytes that had to be read back.
+
+Counters come from ``/proc/<pid>/stat`` and ``/proc/<pid>/io`` on Linux and
+from psutil elsewhere. On Windows psutil reports all page faults (soft and
+hard) and the process's own file reads rather than paging I/O, which is the
+closest per-process signal available.
+"""
+
+from __future__ import annotations
+
+import collections
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import psutil
+
+
+class ProcCounters(NamedTuple):
+	time: float  # time.monotonic() of the sample
+	cpu: float  # user + system seconds
+	faults: int  # page faults, minor + major
+	read_bytes: int
+	rss: int
+
+
+_CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _read_procfs(pid: int) -> ProcCounters:
+	now = time.monotonic()
+	with open(f'/proc/{pid}/stat', 'rb') as f:
+		data = f.read()
+	# after "(comm) ": state ppid pgrp session tty tpgid flags minflt cminflt majflt cmajflt utime stime ...
+	fields = data[data.rfind(b')') + 2:].split(b' ', 22)
+	faults = int(fields[7]) + int(fields[9])
+	cpu = (int(fields[11]) + int(fields[12])) / _CLK_TCK
+	rss = int(fields[21]) * _PAGE_SIZE
+	read_bytes = 0
+	try:
+		with open(f'/proc/{pid}/io', 'rb') as f:
+			for line in f:
+				if line.startswith(b'read_bytes:'):
+					read_bytes = int(line.split()[1])
+					break
+	except OSError:
+		pass  # other users' processes without ptrace access
+	return ProcCounters(now, cpu, faults, read_bytes, rss)
+
+
+def _read_psutil(pid: int) -> ProcCounters:
+	proc = psutil.Process(pid)
+	with proc.oneshot():
+		now = time.monotonic()
+		times = proc.cpu_times()
+		mem = proc.memory_info()
+		try:
+			read_bytes = proc.io_counters().read_bytes
+		except Exception:
+			read_bytes = 0
+	return ProcCounters(now, times.user + times.system, getattr(mem, 'num_page_faults', 0), read_bytes, mem.rss)
+
+
+def read_counters(pid: int) -> Optional[ProcCounters]:
+	"""Current counters of ``pid``, or None if it is gone or inaccessible."""
+	try:
+		if sys.platform.startswith('linux'):
+			return _read_procfs(pid)
+		return _read_psutil(pid)
+	except Exception:
+		return None
+
+
+class TrimOutcome:
+	"""Measurements around one trim; complete once ``end`` is set."""
+
+	__slots__ = ('pid', 'name', 'status', 'fault_rate', 'read_rate', 'before', 'after', 'end')
+
+	def __init__(self, pid: int, fault_rate: float = 0.0, read_rate: float = 0.0):
+		self.pid = pid
+		self.name = ''
+		self.status = 'pending'  # trim status, then 'measured' or 'gone'
+		self.fault_rate = fault_rate  # per second, before the trim
+		self.read_rate = read_rate
+		self.before: Optional[ProcCounters] = None
+		self.after: Optional[ProcCounters] = None
+		self.end: Optional[ProcCounters] = None
+
+	@property
+	def freed(self) -> int:
+		return self.before.rss - self.after.rss if self.before and self.after else 0
+
+	@property
+	def regrown(self) -> int:
+		return max(self.end.rss - self.after.rss, 0) if self.end and self.after else 0
+
+	@property
+	def window(self) -> float:
+		return self.end.time - self.after.time if self.end and self.after else 0.0
+
+	@property
+	def refaults(self) -> int:
+		"""Faults after the trim above the pre-trim rate."""
+		if not (self.end and self.after):
+			return 0
+		return max(int(self.end.faults - self.after.faults - self.fault_rate * self.window), 0)
+
+	@property
+	def reread(self) -> int:
+		"""Bytes read after the trim above the pre-trim rate."""
+		if not (self.end and self.after):
+			return 0
+		return max(int(self.end.read_bytes - self.after.read_bytes - self.read_rate * self.window), 0)
+
+	@property
+	def net(self) -> int:
+		"""Memory still free at the end of the window minus bytes read back."""
+		return max(self.freed, 0) - self.regrown - self.reread
+
+	def describe(self) -> str:
+		mb = 1024 ** 2
+		return (
+			f'{self.name} [{self.pid}]: freed {self.freed / mb:.1f} MB, regrown {self.regrown / mb:.1f} MB, '
+			f'{self.refaults} refaults, {self.reread / mb:.1f} MB re-read -> net {self.net / mb:+.1f} MB'
+		)
+
+
+class RefaultTracker:
+	"""Defers busy processes and measures what each trim cost and saved.
+
+	Finished outcomes are kept in ``outcomes`` (newest last) and passed to
+	``on_outcome`` if given. Call ``poll()`` periodically, or ``start()`` to
+	run it on a daemon thread.
+	"""
+
+	def __init__(
+		self,
+		window: float = 60.0,
+		busy_cpu: float = 0.05,
+		probe: float = 0.5,
+		penalty: float = 1800.0,
+		sampler: Callable[[int], Optional[ProcCounters]] = read_counters,
+		on_outcome: Optional[Callable[[TrimOutcome], None]] = None,
+		history: int = 500,
+	):
+		self.window = window
+		self.busy_cpu = busy_cpu  # fraction of one core
+		self.probe = probe
+		self.penalty = penalty
+		self.sampler = sampler
+		self.on_outcome = on_outcome
+		self.outcomes = collections.deque(maxlen=history)
+		self._baseline: Dict[int, Tuple[float, float]] = {}  # pid -> (fault rate, read rate)
+		self._pending: Dict[int, TrimOutcome] = {}
+		self._penalized: Dict[str, float] = {}  # name -> monotonic time the penalty ends
+		self._lock = threading.Lock()
+		self._stop = threading.Event()
+		self._thread: Optional[threading.Thread] = None
+
+	# -- before trimming --
+
+	def penalized(self, name: str, now: Optional[float] = None) -> bool:
+		until = self._penalized.get(name)
+		return until is not None and (now if now is not None else time.monotonic()) < until
+
+	def select(self, targets: Iterable[Tuple[int, str]]) -> Tuple[List[Tuple[int, str]], List[Tuple[int, str, str]]]:
+		"""Split ``(pid, name)`` targets into (to trim, deferred with reason)."""
+		targets = list(targets)
+		with self._lock:
+			# rates from an earlier run belong to pids that were never trimmed
+			# (deadline, skipped) and may have been reused since
+			self._baseline.clear()
+		first = {pid: self.sampler(pid) for pid, _ in targets}
+		if self.probe > 0:
+			time.sleep(self.probe)
+		eligible, deferred = [], []
+		now = time.monotonic()
+		with self._lock:
+			for pid, name in targets:
+				a, b = first.get(pid), self.sampler(pid)
+				if a is None or b is None or b.time <= a.time:
+					eligible.append((pid, name))  # no counters: trim as before
+					continue
+				dt = b.time - a.time
+				cpu = (b.cpu - a.cpu) / dt
+				self._baseline[pid] = ((b.faults - a.faults) / dt, (b.read_bytes - a.read_bytes) / dt)
+				if self.penalized(name, now):
+					deferred.append((pid, name, 'previous trim was refaulted'))
+				elif cpu > self.busy_cpu:
+					deferred.append((pid, name, f'busy (cpu {cpu * 100:.0f}%)'))
+				else:
+					eligible.append((pid, name))
+		return eligible, deferred
+
+	# -- around each trim (called from trimmer threads) --
+
+	def before(self, pid: int):
+		counters = self.sampler(pid)
+		with self._lock:
+			fault_rate, read_rate = self._baseline.pop(pid, (0.0, 0.0))
+			outcome = TrimOutcome(pid, fault_rate, read_rate)
+			outcome.before = counters
+			self._pending[pid] = outcome
+
+	def after(self, pid: int, name: str, status: str):
+		counters = self.sampler(pid)
+		with self._lock:
+			outcome = self._pending.get(pid)
+			if outcome is None:
+				return
+			outcome.name = name
+			outcome.status = status
+			outcome.after = counters
+			if status != 'trimmed' or counters is None or outcome.before is None:
+				del self._pending[pid]  # nothing was freed; nothing to follow up
+
+	# -- after the window --
+
+	def poll(self) -> List[TrimOutcome]:
+		"""Finish outcomes whose window has elapsed; returns them."""
+		now = time.monotonic()
+		with self._lock:
+			due = [o for o in self._pending.values() if o.after is not None and now - o.after.time >= self.window]
+			for o in due:
+				del self._pending[o.pid]
+		finished = []
+		for o in due:
+			end = self.sampler(o.pid)
+			# counters going backwards mean the pid now belongs to another process
+			if end is None or end.cpu < o.after.cpu or end.faults < o.after.faults:
+				o.status = 'gone'
+			else:
+				o.end = end
+				o.status = 'measured'
+				if o.net < 0 and self.penalty > 0:
+					self._penalized[o.name] = now + self.penalty
+			finished.append(o)
+		with self._lock:
+			self.outcomes.extend(finished)
+			self._penalized = {name: until for name, until in self._penalized.items() if until > now}
+		for o in finished:
+			if self.on_outcome is not None and o.status == 'measured':
+				try:
+					self.on_outcome(o)
+				except Exception as e:
+					print(f'refault outcome callback error: {e}')
+		return finished
+
+	def pending(self) -> int:
+		with self._lock:
+			return len(self._pending)
+
+	def start(self, interval: float = 5.0):
+		if self._thread is not None and self._thread.is_alive():
+			return
+		self._stop.clear()
+
+		def loop():
+			while not self._stop.wait(interval):
+				try:
+					self.poll()
+				except Exception as e:
+					print(f'refault poll error: {e}')
+
+		self._thread = threading.Thread(target=loop, name='refault-tracker', daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		self._stop.set()
+		if self._thread is not None:
+			self._thread.join(timeout=2.0)
+
+	# -- reporting --
+
+	def summary(self, outcomes: Optional[Iterable[TrimOutcome]] = None) -> str:
+		"""Totals over measured outcomes (default: all kept)."""
+		with self._lock:
+			measured = [o for o in (outcomes if outcomes is not None else self.outcomes) if o.status == 'measured']
+		if not measured:
+			return 'no measured trims yet'
+		mb = 1024 ** 2
+		helped = sum(1 for o in measured if o.net > 0)
+		return (
+			f'{len(measured)} trims: {helped} helped, {len(measured) - helped} refaulted; '
+			f'freed {sum(o.freed for o in measured) / mb:.0f} MB, regrown {sum(o.regrown for o in measured) / mb:.0f} MB, '
+			f'{sum(o.refaults for o in measured)} refaults, {sum(o.reread for o in measured) / mb:.0f} MB re-read, '
+			f'net {sum(o.net for o in measured) / mb:+.0f} MB'
+		)
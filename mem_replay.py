@@ -0,0 +1,205 @@
+"""Offline replay of the auto-clean policy against recorded memory traces.
+
+A trace is a JSONL file with one sample per line (``timestamp`` and
+``ram_percent``, as written by ``write_trace`` from ``MemoryMonitor.history``)
+or any iterable of ``MemorySample``. The replay drives the same
+``AutoCleanPolicy`` the monitor uses with the trace timestamps as its clock.
+
+The replay cannot know how much a cleanup would have lowered memory, so it
+answers "when would the policy have fired", not "what would memory have been".
+
+Usage::
+
+	python mem_replay.py trace.jsonl --thresholds 70,80,90 --cooldowns 60,300,900
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import json
+import sys
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from mem_monitor import AutoCleanPolicy, MemorySample
+
+
+# Gaps longer than this many median sample intervals are treated as recording
+# breaks and do not count towards time above threshold.
+MAX_GAP_FACTOR = 10.0
+
+
+class ReplayResult(NamedTuple):
+	threshold: float
+	cooldown: float
+	period_minutes: float
+	fires: List[Tuple[float, str]]  # (timestamp, 'threshold' | 'periodic')
+	threshold_cleanups: int
+	periodic_cleanups: int
+	seconds_above: float
+	longest_above: float
+
+
+class Trace(NamedTuple):
+	timestamps: List[float]
+	percents: List[float]
+	durations: List[float]  # seconds each sample stands for
+
+
+def write_trace(samples: Iterable[MemorySample], path: str):
+	"""Append samples (e.g. ``monitor.history``) to a JSONL trace file."""
+	with open(path, 'a', encoding='utf-8') as f:
+		for s in samples:
+			f.write(json.dumps(s._asdict()) + '\n')
+
+
+def _sample_values(item) -> Tuple[float, float]:
+	if isinstance(item, MemorySample):
+		return item.timestamp, item.ram_percent
+	ts = item.get('timestamp', item.get('ts', item.get('t')))
+	pct = item.get('ram_percent', item.get('percent'))
+	return float(ts), float(pct)
+
+
+def load_trace(source) -> Trace:
+	"""Build a ``Trace`` from a JSONL path or an iterable of samples/dicts."""
+	pairs = []
+	if isinstance(source, str):
+		with open(source, 'r', encoding='utf-8') as f:
+			for n, line in enumerate(f, 1):
+				line = line.strip()
+				if not line:
+					continue
+				try:
+					pairs.append(_sample_values(json.loads(line)))
+				except (ValueError, TypeError) as e:
+					print(f'load_trace: skipping line {n}: {e}')
+	else:
+		pairs = [_sample_values(item) for item in source]
+	pairs.sort()
+	timestamps = [p[0] for p in pairs]
+	percents = [p[1] for p in pairs]
+	return Trace(timestamps, percents, _durations(timestamps))
+
+
+def _durations(timestamps: Sequence[float]) -> List[float]:
+	if len(timestamps) < 2:
+		return [0.0] * len(timestamps)
+	gaps = [b - a for a, b in zip(timestamps, timestamps[1:])]
+	median = sorted(gaps)[len(gaps) // 2]
+	max_gap = median * MAX_GAP_FACTOR if median > 0 else float('inf')
+	durations = [g if g <= max_gap else median for g in gaps]
+	durations.append(median)
+	return durations
+
+
+def _above_stats(trace: Trace, threshold: float) -> Tuple[List[float], float, float]:
+	"""Timestamps at/above threshold, total seconds above, longest episode."""
+	times = [t for t, p in zip(trace.timestamps, trace.percents) if p >= threshold]
+	total = 0.0
+	longest = 0.0
+	run = 0.0
+	for p, d in zip(trace.percents, trace.durations):
+		if p >= threshold:
+			run += d
+			total += d
+		else:
+			if run > longest:
+				longest = run
+			run = 0.0
+	return times, total, max(longest, run)
+
+
+def _jump_fires(times: Sequence[float], gap: float) -> List[float]:
+	"""Fire at the first time, then at the first time >= last + gap, and so on.
+
+	Equivalent to stepping ``threshold_due``/``period_due`` over every sample,
+	but costs O(fires * log n) instead of O(n).
+	"""
+	fires = []
+	i = 0
+	n = len(times)
+	while i < n:
+		t = times[i]
+		fires.append(t)
+		i = bisect.bisect_left(times, t + gap, i + 1)
+	return fires
+
+
+def replay(source, threshold: float = 0, cooldown: float = 300.0, period_minutes: float = 0) -> ReplayResult:
+	"""Step ``AutoCleanPolicy`` over every sample of a trace."""
+	trace = source if isinstance(source, Trace) else load_trace(source)
+	policy = AutoCleanPolicy(threshold=threshold, cooldown=cooldown, period_enabled=bool(period_minutes), period_minutes=period_minutes)
+	# start the virtual clock "long ago" so the first due check passes, as in the live loop
+	policy.last_auto_clean = policy.last_periodic_clean = float('-inf')
+	fires = []
+	for t, p in zip(trace.timestamps, trace.percents):
+		reason = policy.evaluate(p, t)
+		if reason:
+			fires.append((t, reason))
+	_, seconds_above, longest = _above_stats(trace, threshold) if threshold else ([], 0.0, 0.0)
+	return ReplayResult(
+		threshold, cooldown, period_minutes, fires,
+		sum(1 for f in fires if f[1] == 'threshold'),
+		sum(1 for f in fires if f[1] == 'periodic'),
+		seconds_above, longest,
+	)
+
+
+def sweep(source, thresholds: Sequence[float], cooldowns: Sequence[float], period_minutes: float = 0) -> List[ReplayResult]:
+	"""Replay every threshold x cooldown combination.
+
+	Each threshold scans the trace once; each cooldown then only jumps between
+	firings, so large grids over long traces stay cheap.
+
+	The threshold and periodic timers are treated independently, as the GUI
+	runs them in separate loops. ``replay`` goes through
+	``AutoCleanPolicy.evaluate``, which reports one reason per tick, so the
+	two only differ when both timers are due on the same sample.
+	"""
+	trace = source if isinstance(source, Trace) else load_trace(source)
+	periodic = []
+	if period_minutes:
+		periodic = [(t, 'periodic') for t in _jump_fires(trace.timestamps, period_minutes * 60)]
+	results = []
+	for th in thresholds:
+		times, seconds_above, longest = _above_stats(trace, th)
+		for cd in cooldowns:
+			fired = [(t, 'threshold') for t in _jump_fires(times, cd)] if th else []
+			results.append(ReplayResult(
+				th, cd, period_minutes, sorted(fired + periodic),
+				len(fired), len(periodic), seconds_above, longest,
+			))
+	return results
+
+
+def _parse_list(value: str) -> List[float]:
+	return [float(v) for v in value.split(',') if v.strip()]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+	parser = argparse.ArgumentParser(description='Replay auto-clean settings against a recorded memory trace.')
+	parser.add_argument('trace', help='JSONL trace file')
+	parser.add_argument('--thresholds', type=_parse_list, default=[80.0], help='comma-separated percents')
+	parser.add_argument('--cooldowns', type=_parse_list, default=[300.0], help='comma-separated seconds')
+	parser.add_argument('--period', type=float, default=0, help='periodic auto-clean interval, minutes (0 = off)')
+	parser.add_argument('--fires', action='store_true', help='list firing times for each combination')
+	args = parser.parse_args(argv)
+
+	trace = load_trace(args.trace)
+	if not trace.timestamps:
+		print('Trace is empty')
+		return 1
+	span = trace.timestamps[-1] - trace.timestamps[0]
+	print(f'{len(trace.timestamps)} samples over {span / 3600:.1f} h')
+	print(f"{'threshold':>9} {'cooldown':>9} {'thresh':>7} {'period':>7} {'above, min':>11} {'longest, min':>13}")
+	for r in sweep(trace, args.thresholds, args.cooldowns, args.period):
+		print(f'{r.threshold:>8.0f}% {r.cooldown:>8.0f}s {r.threshold_cleanups:>7} {r.periodic_cleanups:>7} {r.seconds_above / 60:>11.1f} {r.longest_above / 60:>13.1f}')
+		if args.fires:
+			for t, reason in r.fires:
+				print(f'    {t:.0f} {reason}')
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,350 @@
+"""Shared-memory publication of live samples.
+
+A single writer publishes the latest ``MemorySample``, a ring of recent
+samples and a top-N application table into a memory-mapped segment. Local
+readers map the same segment and read it in place. There are no sockets and
+no requests to the sampler.
+
+Layout (little-endian, offsets in bytes)::
+
+	0    header   magic[8] layout u32 pid u32 seq u64 updated f64
+	              history_capacity u32 history_head u32 history_count u32
+	              top_capacity u32 top_count u32 pad[12]
+	64   latest   MemorySample record (64 bytes)
+	128  history  history_capacity MemorySample records, oldest at
+	              (head - count) mod capacity
+	...  top      top_capacity records: pid u32 count u32 rss u64 name[32]
+
+``seq`` is a seqlock: the writer makes it odd before writing and even
+afterwards. A reader that sees an odd value, or a different value after
+reading, retries.
+
+Readers check about once a second whether the publisher has been replaced.
+That is the case when the segment file was unlinked or re-created, or when
+nothing has been published for ``reopen_after`` seconds. They then remap,
+so they pick up a restarted publisher.
+
+On Windows the segment is a named mapping (``Local\\<name>``); elsewhere a
+file in ``/dev/shm`` (or the temp directory). Run a headless publisher with
+``python mem_shm.py`` and read it from another process with
+``python mem_shm.py --read``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from typing import Iterable, List, NamedTuple, Optional
+
+from mem_monitor import MemoryMonitor, MemorySample, read_sample
+
+
+SEGMENT_NAME = 'mem_proccess_samples'
+MAGIC = b'MEMSHM\x00\x01'
+LAYOUT_VERSION = 1
+HISTORY_CAPACITY = 600
+TOP_CAPACITY = 16
+NAME_BYTES = 32
+
+HEADER = struct.Struct('<8sIIQdIIIII12x')
+SAMPLE = struct.Struct('<dQQQdQQd')
+TOP_ROW = struct.Struct(f'<IIQ{NAME_BYTES}s')
+SEQ_OFFSET = 16
+SEQ = struct.Struct('<Q')
+LATEST_OFFSET = 64
+HISTORY_OFFSET = LATEST_OFFSET + SAMPLE.size
+
+assert HEADER.size == 64 and SAMPLE.size == 64
+
+
+class TopRow(NamedTuple):
+	pid: int
+	count: int  # processes in the application
+	rss: int
+	name: str
+
+
+def segment_size(history_capacity: int = HISTORY_CAPACITY, top_capacity: int = TOP_CAPACITY) -> int:
+	return HISTORY_OFFSET + history_capacity * SAMPLE.size + top_capacity * TOP_ROW.size
+
+
+def _segment_path(name: str) -> str:
+	base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+	return os.path.join(base, name)
+
+
+def _map(name: str, size: int, create: bool) -> mmap.mmap:
+	if os.name == 'nt':
+		# opens the existing mapping, or creates a zeroed one with no publisher
+		return mmap.mmap(-1, size, tagname=f'Local\\{name}')
+	path = _segment_path(name)
+	if create:
+		fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+		try:
+			os.ftruncate(fd, size)
+			return mmap.mmap(fd, size)
+		finally:
+			os.close(fd)
+	fd = os.open(path, os.O_RDONLY)
+	try:
+		return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+	finally:
+		os.close(fd)
+
+
+class SharedSampleWriter:
+	"""Publishes samples into the segment. Use one writer per segment name."""
+
+	def __init__(self, name: str = SEGMENT_NAME, history_capacity: int = HISTORY_CAPACITY, top_capacity: int = TOP_CAPACITY):
+		self.name = name
+		self.history_capacity = history_capacity
+		self.top_capacity = top_capacity
+		self.top_offset = HISTORY_OFFSET + history_capacity * SAMPLE.size
+		self._mm = _map(name, segment_size(history_capacity, top_capacity), create=True)
+		self._view = memoryview(self._mm)
+		self._seq = 0
+		self._head = 0
+		self._count = 0
+		self._top: List[TopRow] = []
+		self._lock = threading.Lock()
+		self._write_header(0.0)
+
+	def _write_header(self, updated: float):
+		HEADER.pack_into(
+			self._view, 0, MAGIC, LAYOUT_VERSION, os.getpid(), self._seq, updated,
+			self.history_capacity, self._head, self._count, self.top_capacity, len(self._top),
+		)
+
+	def publish(self, sample: MemorySample, top: Optional[Iterable[TopRow]] = None):
+		"""Write ``sample`` as latest, append it to history and optionally replace the top table."""
+		with self._lock:
+			view = self._view
+			self._seq += 1  # odd: write in progress
+			SEQ.pack_into(view, SEQ_OFFSET, self._seq)
+			SAMPLE.pack_into(view, LATEST_OFFSET, *sample)
+			SAMPLE.pack_into(view, HISTORY_OFFSET + self._head * SAMPLE.size, *sample)
+			self._head = (self._head + 1) % self.history_capacity
+			self._count = min(self._count + 1, self.history_capacity)
+			if top is not None:
+				self._top = list(top)[:self.top_capacity]
+				for i, row in enumerate(self._top):
+					TOP_ROW.pack_into(view, self.top_offset + i * TOP_ROW.size, row.pid, row.count, row.rss, row.name.encode('utf-8', 'replace')[:NAME_BYTES])
+			self._write_header(sample.timestamp)
+			self._seq += 1  # even: consistent
+			SEQ.pack_into(view, SEQ_OFFSET, self._seq)
+
+	def attach(self, monitor: MemoryMonitor, interval: float = 1.0, top_source=None):
+		"""Publish every sample of ``monitor``; ``top_source()`` may return TopRows."""
+		def on_sample(sample):
+			top = None
+			if top_source is not None:
+				try:
+					top = top_source()
+				except Exception as e:
+					print(f'shm top source error: {e}')
+			self.publish(sample, top)
+		return monitor.subscribe(on_sample, interval=interval)
+
+	def close(self):
+		with self._lock:
+			self._view.release()
+			self._mm.close()
+		if os.name != 'nt':
+			try:
+				os.unlink(_segment_path(self.name))
+			except OSError:
+				pass
+
+
+class Snapshot(NamedTuple):
+	writer_pid: int
+	updated: float
+	latest: Optional[MemorySample]
+	history: List[MemorySample]
+	top: List[TopRow]
+
+
+class SharedSampleReader:
+	"""Reads the segment in place; safe to use from any number of processes."""
+
+	def __init__(self, name: str = SEGMENT_NAME, retries: int = 100, reopen_after: float = 5.0, check_interval: float = 1.0):
+		self.name = name
+		self.retries = retries
+		self.reopen_after = reopen_after
+		self.check_interval = check_interval
+		self._mm = None
+		self._view = None
+		self._ident = None  # (st_dev, st_ino) of the mapped file
+		self._next_check = 0.0
+		self._lock = threading.Lock()  # a remap must not race a read on another thread
+
+	def _replaced(self) -> bool:
+		"""True if the mapped segment no longer belongs to a live publisher."""
+		if os.name != 'nt':
+			try:
+				st = os.stat(_segment_path(self.name))
+			except OSError:
+				return True
+			if (st.st_dev, st.st_ino) != self._ident:
+				return True
+		updated = HEADER.unpack_from(self._view, 0)[4]
+		return time.time() - updated > self.reopen_after
+
+	def _open(self) -> bool:
+		if self._view is not None:
+			now = time.monotonic()
+			if now < self._next_check:
+				return True
+			self._next_check = now + self.check_interval
+			if not self._replaced():
+				return True
+			self._unmap()
+		try:
+			if os.name == 'nt':
+				mm = _map(self.name, segment_size(), create=False)
+			else:
+				mm = _map(self.name, 0, create=False)
+				st = os.stat(_segment_path(self.name))
+				self._ident = (st.st_dev, st.st_ino)
+		except OSError:
+			return False
+		view = memoryview(mm)
+		if bytes(view[:8]) != MAGIC:
+			view.release()
+			mm.close()
+			return False
+		self._mm, self._view = mm, view
+		self._next_check = time.monotonic() + self.check_interval
+		return True
+
+	def _read(self, fn):
+		"""Run ``fn(view, header)`` under the seqlock; returns None if no publisher."""
+		with self._lock:
+			if not self._open():
+				return None
+			view = self._view
+			for _ in range(self.retries):
+				s1 = SEQ.unpack_from(view, SEQ_OFFSET)[0]
+				if s1 & 1:
+					time.sleep(0)
+					continue
+				try:
+					header = HEADER.unpack_from(view, 0)
+					result = fn(view, header)
+				except (struct.error, ValueError, ZeroDivisionError):
+					continue  # torn read of the header; retry
+				if SEQ.unpack_from(view, SEQ_OFFSET)[0] == s1:
+					return result
+			return None
+
+	def latest(self) -> Optional[MemorySample]:
+		def read(view, header):
+			sample = MemorySample(*SAMPLE.unpack_from(view, LATEST_OFFSET))
+			return sample if sample.timestamp else None
+		return self._read(read)
+
+	def snapshot(self) -> Optional[Snapshot]:
+		"""Latest sample, history (oldest first) and top table, all from one version."""
+		def read(view, header):
+			_, _, pid, _, updated, cap, head, count, _, top_count = header
+			latest = MemorySample(*SAMPLE.unpack_from(view, LATEST_OFFSET))
+			history = [
+				MemorySample(*SAMPLE.unpack_from(view, HISTORY_OFFSET + ((head - count + i) % cap) * SAMPLE.size))
+				for i in range(count)
+			]
+			top_offset = HISTORY_OFFSET + cap * SAMPLE.size
+			top = []
+			for i in range(top_count):
+				pid_, n, rss, raw = TOP_ROW.unpack_from(view, top_offset + i * TOP_ROW.size)
+				top.append(TopRow(pid_, n, rss, raw.rstrip(b'\x00').decode('utf-8', 'replace')))
+			return Snapshot(pid, updated, latest if latest.timestamp else None, history, top)
+		return self._read(read)
+
+	def is_live(self, max_age: float = 5.0) -> bool:
+		sample = self.latest()
+		return sample is not None and time.time() - sample.timestamp <= max_age
+
+	def sampler(self, max_age: float = 5.0):
+		"""A ``MemoryMonitor`` sampler that reads the segment.
+
+		Falls back to sampling locally while no publisher is live.
+		"""
+		def sample() -> MemorySample:
+			s = self.latest()
+			if s is not None and time.time() - s.timestamp <= max_age:
+				return s
+			return read_sample()
+		return sample
+
+	def _unmap(self):
+		if self._view is not None:
+			self._view.release()
+			self._mm.close()
+			self._view = self._mm = None
+
+	def close(self):
+		with self._lock:
+			self._unmap()
+
+
+def tree_top_source(tree, n: int = TOP_CAPACITY):
+	"""Top-N applications of a ``ProcessTree`` as TopRows."""
+	def top() -> List[TopRow]:
+		with tree.lock:
+			return [TopRow(max(app.root, 0), len(app.members), app.rss, app.name) for app in tree.top_apps(n)]
+	return top
+
+
+def run_headless(name: str = SEGMENT_NAME, interval: float = 1.0, tree_interval: float = 3.0):
+	"""Sample and publish without a GUI until interrupted."""
+	from mem_proctree import ProcessTree
+
+	monitor = MemoryMonitor()
+	tree = ProcessTree()
+	writer = SharedSampleWriter(name)
+	sub = writer.attach(monitor, interval=interval, top_source=tree_top_source(tree))
+	print(f'Publishing memory samples to shared segment {name!r} (Ctrl+C to stop)')
+	try:
+		while True:
+			try:
+				tree.refresh()
+			except Exception as e:
+				print(f'process tree refresh error: {e}')
+			time.sleep(tree_interval)
+	except KeyboardInterrupt:
+		pass
+	finally:
+		sub.close()
+		writer.close()
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description='Publish or read live memory samples through shared memory.')
+	parser.add_argument('--name', default=SEGMENT_NAME)
+	parser.add_argument('--read', action='store_true', help='print the current contents instead of publishing')
+	parser.add_argument('--interval', type=float, default=1.0)
+	args = parser.parse_args(argv)
+	if not args.read:
+		run_headless(args.name, args.interval)
+		return 0
+	reader = SharedSampleReader(args.name)
+	snap = reader.snapshot()
+	if snap is None or snap.latest is None:
+		print('No publisher found')
+		return 1
+	s = snap.latest
+	print(f'writer pid {snap.writer_pid}, {time.time() - s.timestamp:.1f}s ago, {len(snap.history)} samples in history')
+	print(f'RAM {s.ram_percent:.1f}% ({s.ram_used / (1024**3):.2f} / {s.ram_total / (1024**3):.2f} GB), swap {s.swap_percent:.1f}%')
+	for row in snap.top:
+		print(f'  {row.name:<24} {row.rss / (1024**2):>8.0f} MB  {row.count:>3} proc  [{row.pid}]')
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,285 @@
+"""Fan-out of samples to independent sinks.
+
+Every sink has its own bounded queue and worker thread, so a slow consumer
+(file log, network push, tray icon rendering) never sets the sampling rate.
+When a sink's queue is full, its ``overflow`` policy decides what happens:
+
+- ``drop_oldest``: discard the oldest queued sample (default)
+- ``latest``: keep only the newest pending sample (coalesce)
+- ``block``: wait up to ``block_timeout`` for room, then drop the new sample.
+  A sink whose worker has made no progress for ``stall_after`` seconds is
+  considered stuck and drops without waiting, so it cannot hold up the
+  sampler.
+
+Sinks can be declared in the config under ``"sinks"``::
+
+	"sinks": [
+		{"type": "jsonl", "path": "mem_trace.jsonl", "overflow": "drop_oldest", "maxsize": 256},
+		{"type": "http", "url": "http://127.0.0.1:9000/samples", "overflow": "latest"}
+	]
+"""
+
+from __future__ import annotations
+
+import collections
+import json
+import threading
+import time
+import urllib.request
+from typing import Callable, Dict, List, Optional
+
+from mem_monitor import MemoryMonitor, MemorySample
+
+
+OVERFLOW_POLICIES = ('drop_oldest', 'latest', 'block')
+
+
+class Sink:
+	"""Base class: subclasses implement ``handle(sample)``."""
+
+	def __init__(self, name: str = '', maxsize: int = 128, overflow: str = 'drop_oldest', block_timeout: float = 0.05, stall_after: float = 1.0):
+		if overflow not in OVERFLOW_POLICIES:
+			raise ValueError(f'overflow must be one of {OVERFLOW_POLICIES}')
+		self.name = name or type(self).__name__
+		self.maxsize = 1 if overflow == 'latest' else max(1, int(maxsize))
+		self.overflow = overflow
+		self.block_timeout = block_timeout
+		self.stall_after = stall_after
+		self.received = 0
+		self.delivered = 0
+		self.dropped = 0
+		self.errors = 0
+		self.last_delivered = 0.0  # timestamp of the last handled sample
+		self._queue = collections.deque()
+		self._cond = threading.Condition()
+		self._stopping = False
+		self._thread: Optional[threading.Thread] = None
+		self._last_progress = time.monotonic()
+
+	def handle(self, sample: MemorySample):
+		raise NotImplementedError
+
+	def close(self):
+		"""Release resources after the worker has stopped."""
+
+	# -- producer side --
+
+	def offer(self, sample: MemorySample):
+		"""Queue a sample according to the overflow policy; never blocks unboundedly."""
+		with self._cond:
+			self.received += 1
+			if len(self._queue) >= self.maxsize:
+				if self.overflow == 'block' and time.monotonic() - self._last_progress < self.stall_after:
+					deadline = time.monotonic() + self.block_timeout
+					while len(self._queue) >= self.maxsize and not self._stopping:
+						remaining = deadline - time.monotonic()
+						if remaining <= 0:
+							break
+						self._cond.wait(remaining)
+					if len(self._queue) >= self.maxsize:
+						self.dropped += 1
+						return
+				elif self.overflow == 'block':
+					self.dropped += 1  # stuck: drop the new sample right away
+					return
+				else:
+					# 'latest' has maxsize 1, so this replaces the pending sample
+					self._queue.popleft()
+					self.dropped += 1
+			self._queue.append(sample)
+			self._cond.notify_all()
+
+	# -- worker side --
+
+	def start(self):
+		if self._thread is not None and self._thread.is_alive():
+			return
+		self._stopping = False
+		self._last_progress = time.monotonic()
+		self._thread = threading.Thread(target=self._run, name=f'sink-{self.name}', daemon=True)
+		self._thread.start()
+
+	def stop(self, timeout: float = 2.0):
+		with self._cond:
+			self._stopping = True
+			self._cond.notify_all()
+		if self._thread is not None:
+			self._thread.join(timeout)
+		try:
+			self.close()
+		except Exception as e:
+			print(f'sink {self.name} close error: {e}')
+
+	def _run(self):
+		while True:
+			with self._cond:
+				while not self._queue and not self._stopping:
+					self._cond.wait()
+				if not self._queue:
+					return  # stopping and drained
+				sample = self._queue.popleft()
+				self._last_progress = time.monotonic()
+				self._cond.notify_all()
+			try:
+				self.handle(sample)
+				self._last_progress = time.monotonic()
+				self.delivered += 1
+				self.last_delivered = sample.timestamp
+			except Exception as e:
+				self.errors += 1
+				print(f'sink {self.name} error: {e}')
+
+	def stats(self) -> dict:
+		with self._cond:
+			pending = len(self._queue)
+			oldest = self._queue[0].timestamp if self._queue else None
+		return {
+			'name': self.name,
+			'overflow': self.overflow,
+			'pending': pending,
+			'lag_seconds': (time.time() - oldest) if oldest else 0.0,
+			'received': self.received,
+			'delivered': self.delivered,
+			'dropped': self.dropped,
+			'errors': self.errors,
+		}
+
+
+class CallbackSink(Sink):
+	def __init__(self, fn: Callable[[MemorySample], None], **kwargs):
+		super().__init__(**kwargs)
+		self.fn = fn
+
+	def handle(self, sample: MemorySample):
+		self.fn(sample)
+
+
+class JsonlFileSink(Sink):
+	"""Appends samples to a JSONL file (readable by ``mem_replay``)."""
+
+	def __init__(self, path: str, flush_every: int = 10, **kwargs):
+		kwargs.setdefault('name', f'jsonl:{path}')
+		super().__init__(**kwargs)
+		self.path = path
+		self.flush_every = max(1, int(flush_every))
+		self._file = None
+		self._unflushed = 0
+
+	def handle(self, sample: MemorySample):
+		if self._file is None:
+			self._file = open(self.path, 'a', encoding='utf-8')
+		self._file.write(json.dumps(sample._asdict()) + '\n')
+		self._unflushed += 1
+		if self._unflushed >= self.flush_every:
+			self._file.flush()
+			self._unflushed = 0
+
+	def close(self):
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+
+
+class HttpPostSink(Sink):
+	"""POSTs each sample as JSON to ``url``."""
+
+	def __init__(self, url: str, timeout: float = 2.0, **kwargs):
+		kwargs.setdefault('name', f'http:{url}')
+		kwargs.setdefault('overflow', 'latest')
+		super().__init__(**kwargs)
+		self.url = url
+		self.timeout = timeout
+
+	def handle(self, sample: MemorySample):
+		body = json.dumps(sample._asdict()).encode('utf-8')
+		req = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'}, method='POST')
+		with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+			resp.read()
+
+
+class SharedMemorySink(Sink):
+	"""Publishes into the shared sample segment (see ``mem_shm``)."""
+
+	def __init__(self, segment: str = '', top_source=None, **kwargs):
+		from mem_shm import SEGMENT_NAME, SharedSampleWriter
+		kwargs.setdefault('name', 'shm')
+		kwargs.setdefault('overflow', 'latest')
+		super().__init__(**kwargs)
+		self.writer = SharedSampleWriter(segment or SEGMENT_NAME)
+		self.top_source = top_source
+
+	def handle(self, sample: MemorySample):
+		self.writer.publish(sample, self.top_source() if self.top_source else None)
+
+	def close(self):
+		self.writer.close()
+
+
+SINK_TYPES: Dict[str, type] = {
+	'jsonl': JsonlFileSink,
+	'http': HttpPostSink,
+	'shm': SharedMemorySink,
+}
+
+
+def register_sink_type(name: str, cls: type):
+	SINK_TYPES[name] = cls
+
+
+def build_sinks(entries: List[dict]) -> List[Sink]:
+	"""Create sinks from config entries; invalid entries are reported and skipped."""
+	sinks = []
+	for entry in entries or []:
+		try:
+			kwargs = dict(entry)
+			cls = SINK_TYPES[kwargs.pop('type')]
+			sinks.append(cls(**kwargs))
+		except Exception as e:
+			print(f'sink config error {entry!r}: {e}')
+	return sinks
+
+
+class SinkHub:
+	"""Distributes samples from a ``MemoryMonitor`` to every registered sink.
+
+	The sampling thread only calls ``Sink.offer``; all delivery happens on
+	the sinks' own threads.
+	"""
+
+	def __init__(self):
+		self.sinks: List[Sink] = []
+		self._lock = threading.Lock()
+		self._subscription = None
+
+	def add(self, sink: Sink) -> Sink:
+		sink.start()
+		with self._lock:
+			self.sinks = self.sinks + [sink]
+		return sink
+
+	def remove(self, sink: Sink):
+		with self._lock:
+			self.sinks = [s for s in self.sinks if s is not sink]
+		sink.stop()
+
+	def publish(self, sample: MemorySample):
+		for sink in self.sinks:  # copy-on-write list, no lock needed
+			try:
+				sink.offer(sample)
+			except Exception as e:
+				print(f'sink {sink.name} offer error: {e}')
+
+	def attach(self, monitor: MemoryMonitor, interval: float = 1.0):
+		self._subscription = monitor.subscribe(self.publish, interval=interval)
+		return self._subscription
+
+	def stats(self) -> List[dict]:
+		return [s.stats() for s in self.sinks]
+
+	def close(self):
+		if self._subscription is not None:
+			self._subscription.close()
+			self._subscription = None
+		for sink in self.sinks:
+			sink.stop()
+		self.sinks = []
@@ -0,0 +1,202 @@
+"""Per-process memory region breakdown from ``/proc/<pid>/smaps`` (Linux).
+
+``smaps`` has one header line per mapping followed by ~20 ``Field: N kB``
+lines. The parser reads the file in fixed-size chunks and matches each
+mapping's header together with its ``Rss``/``Pss``/``Swap`` fields in one
+regex step, so it never holds the whole file or a list of lines. Regions are
+grouped by kind (heap, stack, anonymous, shared library, mapped file,
+shared memory, special) and backing file.
+
+``SmapsCache`` re-parses a process only when its mapping count (the line
+count of the much smaller ``/proc/<pid>/maps``) or its identity changes.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+import threading
+from typing import Dict, List, NamedTuple, Tuple
+
+
+CHUNK_SIZE = 1 << 20
+
+# One match per mapping: the header line ("start-end perms offset dev inode
+# [path]") and the Rss, Pss and Swap lines that follow it. Skipping the other
+# field lines inside the regex keeps the Python loop to one step per mapping.
+_SMAPS_RE = re.compile(
+	rb'^[0-9a-f]+-[0-9a-f]+ \S+ \S+ \S+ \S+ *([^\n]*)\n'
+	rb'(?:[^\n]*\n)*?Rss: +(\d+) kB\n'
+	rb'(?:[^\n]*\n)*?Pss: +(\d+) kB\n'
+	rb'(?:[^\n]*\n)*?Swap: +(\d+) kB\n',
+	re.M,
+)
+
+
+class RegionGroup(NamedTuple):
+	kind: str
+	backing: str
+	count: int
+	rss: int  # bytes
+	pss: int
+	swap: int
+
+
+class RegionBreakdown(NamedTuple):
+	pid: int
+	mappings: int
+	groups: List[RegionGroup]  # largest RSS first
+	rollup: Dict[str, int]  # smaps_rollup fields in bytes (empty if unavailable)
+
+
+def region_kind(path: str) -> Tuple[str, str]:
+	"""Classify a mapping by its path column; returns (kind, backing)."""
+	if not path:
+		return 'anonymous', ''
+	if path == '[heap]':
+		return 'heap', path
+	if path.startswith('[stack'):
+		return 'stack', '[stack]'
+	if path.startswith('[anon'):
+		return 'anonymous', path
+	if path.startswith('['):
+		return 'special', path
+	if path.startswith('/dev/shm/') or path.startswith('/memfd:') or path.startswith('/SYSV'):
+		return 'shared memory', path
+	base = path.rsplit('/', 1)[-1]
+	if base.endswith('.so') or '.so.' in base:
+		return 'shared library', path
+	return 'mapped file', path
+
+
+def smaps_available() -> bool:
+	return sys.platform.startswith('linux') and os.path.exists('/proc/self/smaps')
+
+
+def parse_smaps_rollup(pid: int, root: str = '/proc') -> Dict[str, int]:
+	"""All ``N kB`` fields of ``smaps_rollup`` in bytes."""
+	out = {}
+	with open(f'{root}/{pid}/smaps_rollup', 'rb') as f:
+		for line in f:
+			key, sep, rest = line.partition(b':')
+			parts = rest.split()
+			if sep and len(parts) == 2 and parts[1] == b'kB':
+				out[key.decode()] = int(parts[0]) * 1024
+	return out
+
+
+def parse_smaps(pid: int, root: str = '/proc') -> Tuple[int, List[RegionGroup]]:
+	"""Stream ``smaps`` and return (mapping count, groups by RSS)."""
+	groups: Dict[Tuple[str, str], List[int]] = {}  # key -> [count, rss, pss, swap] in kB
+	kinds: Dict[bytes, Tuple[str, str]] = {}  # path -> (kind, backing)
+	mappings = 0
+	tail = b''
+	with open(f'{root}/{pid}/smaps', 'rb', buffering=0) as f:
+		while True:
+			chunk = f.read(CHUNK_SIZE)
+			data = tail + chunk
+			end = 0
+			for m in _SMAPS_RE.finditer(data):
+				path, rss, pss, swap = m.groups()
+				key = kinds.get(path)
+				if key is None:
+					key = kinds[path] = region_kind(path.decode('utf-8', 'replace'))
+				g = groups.get(key)
+				if g is None:
+					g = groups[key] = [0, 0, 0, 0]
+				g[0] += 1
+				g[1] += int(rss)
+				g[2] += int(pss)
+				g[3] += int(swap)
+				mappings += 1
+				end = m.end()
+			# a mapping cut by the chunk boundary is completed by the next read
+			tail = data[end:]
+			if not chunk:
+				break
+	result = [RegionGroup(kind, backing, c, rss * 1024, pss * 1024, swap * 1024) for (kind, backing), (c, rss, pss, swap) in groups.items()]
+	result.sort(key=lambda g: g.rss, reverse=True)
+	return mappings, result
+
+
+def count_mappings(pid: int, root: str = '/proc') -> int:
+	"""Number of mappings, from the line count of ``maps``."""
+	n = 0
+	with open(f'{root}/{pid}/maps', 'rb', buffering=0) as f:
+		while True:
+			chunk = f.read(CHUNK_SIZE)
+			if not chunk:
+				return n
+			n += chunk.count(b'\n')
+
+
+def summarize_by_kind(groups: List[RegionGroup]) -> List[RegionGroup]:
+	"""Collapse groups to one row per kind."""
+	totals: Dict[str, List[int]] = {}
+	for g in groups:
+		t = totals.setdefault(g.kind, [0, 0, 0, 0])
+		t[0] += g.count
+		t[1] += g.rss
+		t[2] += g.pss
+		t[3] += g.swap
+	rows = [RegionGroup(kind, '', *t) for kind, t in totals.items()]
+	rows.sort(key=lambda g: g.rss, reverse=True)
+	return rows
+
+
+class SmapsCache:
+	"""Caches breakdowns; a process is re-parsed only when its mappings change."""
+
+	def __init__(self, root: str = '/proc', max_entries: int = 64):
+		self.root = root
+		self.max_entries = max_entries
+		self.parses = 0
+		self._entries: Dict[int, Tuple[bytes, int, RegionBreakdown]] = {}
+		self._lock = threading.Lock()
+
+	def _identity(self, pid: int) -> bytes:
+		# starttime (field 22) tells a reused pid apart
+		with open(f'{self.root}/{pid}/stat', 'rb') as f:
+			data = f.read()
+		return data[data.rfind(b')') + 2:].split(b' ', 20)[19]
+
+	def breakdown(self, pid: int) -> RegionBreakdown:
+		identity = self._identity(pid)
+		count = count_mappings(pid, self.root)
+		with self._lock:
+			entry = self._entries.get(pid)
+			if entry is not None and entry[0] == identity and entry[1] == count:
+				return entry[2]
+		mappings, groups = parse_smaps(pid, self.root)
+		try:
+			rollup = parse_smaps_rollup(pid, self.root)
+		except OSError:
+			rollup = {}  # kernels before 4.14
+		result = RegionBreakdown(pid, mappings, groups, rollup)
+		with self._lock:
+			self.parses += 1
+			if len(self._entries) >= self.max_entries and pid not in self._entries:
+				self._entries.pop(next(iter(self._entries)))
+			self._entries[pid] = (identity, count, result)
+		return result
+
+
+def format_breakdown(b: RegionBreakdown, limit: int = 15) -> List[str]:
+	"""Human-readable lines: totals by kind, then the largest groups."""
+	mb = 1024 ** 2
+	lines = [f'PID {b.pid}: {b.mappings} mappings']
+	if b.rollup:
+		lines.append(f"Rss {b.rollup.get('Rss', 0) / mb:.1f} MB, Pss {b.rollup.get('Pss', 0) / mb:.1f} MB, Swap {b.rollup.get('Swap', 0) / mb:.1f} MB")
+	lines.append(f"{'kind':<16} {'maps':>6} {'RSS MB':>9} {'PSS MB':>9} {'Swap MB':>9}")
+	for g in summarize_by_kind(b.groups):
+		lines.append(f'{g.kind:<16} {g.count:>6} {g.rss / mb:>9.1f} {g.pss / mb:>9.1f} {g.swap / mb:>9.1f}')
+	lines.append('')
+	for g in b.groups[:limit]:
+		lines.append(f"{g.rss / mb:>9.1f} MB  {g.kind:<15} {g.backing or '-'}")
+	return lines
+
+
+if __name__ == '__main__':
+	pid = int(sys.argv[1]) if len(sys.argv) > 1 else os.getpid()
+	print('\n'.join(format_breakdown(SmapsCache().breakdown(pid))))
@@ -0,0 +1,276 @@
+"""Parallel, deadline-bounded working-set trimming.
+
+``ParallelTrimmer`` dispatches one trim per process to a bounded set of
+daemon worker threads. A process whose trim call does not return within
+``per_process_timeout`` is reported as ``'timeout'`` and no longer holds up
+the run. Once the overall ``deadline`` passes, the run returns. Concurrency
+is lowered while the disks are busy, because a trimmed working set is paged
+back in from disk.
+
+The trimming itself is done by a backend with a ``trim(pid) -> bool`` method
+(False means access was denied; other failures raise). ``WindowsTrimBackend`` calls
+``EmptyWorkingSet``; ``FakeTrimBackend`` injects latency for testing.
+
+With a ``tracker`` (see ``mem_refault``) each trim call is bracketed by
+counter samples, so its refault cost can be measured later. The tracker can
+be set on the trimmer or passed to a single ``run``.
+"""
+
+from __future__ import annotations
+
+import collections
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import psutil
+
+
+class TrimResult(NamedTuple):
+	pid: int
+	name: str
+	status: str  # 'trimmed' | 'denied' | 'timeout' | 'skipped' | 'deferred' | 'error'
+	duration: float
+	error: str = ''
+
+
+class TrimReport(NamedTuple):
+	results: List[TrimResult]
+	elapsed: float
+	deadline_hit: bool
+
+	def counts(self) -> Dict[str, int]:
+		return dict(collections.Counter(r.status for r in self.results))
+
+	def summary(self) -> str:
+		counts = self.counts()
+		parts = ', '.join(f'{k} {v}' for k, v in sorted(counts.items()))
+		return f"{parts or 'nothing to trim'} in {self.elapsed:.2f}s" + (' (deadline reached)' if self.deadline_hit else '')
+
+
+# --- Backends ---
+
+class WindowsTrimBackend:
+	"""``EmptyWorkingSet`` + ``SetProcessWorkingSetSize(-1, -1)`` via ctypes.
+
+	``trim`` returns False when access is denied and raises ``OSError`` with
+	the ``GetLastError`` code for any other failure.
+	"""
+
+	PROCESS_SET_QUOTA = 0x0100
+	PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+	ERROR_ACCESS_DENIED = 5
+
+	def __init__(self):
+		import ctypes
+		from ctypes import wintypes
+		self._get_last_error = ctypes.get_last_error
+		self.kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+		self.psapi = ctypes.WinDLL('psapi', use_last_error=True)
+		self.kernel32.OpenProcess.restype = wintypes.HANDLE
+		self.kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+		self.kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+		self.kernel32.SetProcessWorkingSetSize.argtypes = [wintypes.HANDLE, ctypes.c_size_t, ctypes.c_size_t]
+		self.kernel32.SetProcessWorkingSetSize.restype = wintypes.BOOL
+		self.psapi.EmptyWorkingSet.argtypes = [wintypes.HANDLE]
+		self.psapi.EmptyWorkingSet.restype = wintypes.BOOL
+		# (SIZE_T)-1 for both limits asks Windows to remove as many pages as possible
+		self._size_max = ctypes.c_size_t(-1).value
+
+	def _fail(self, call: str) -> bool:
+		code = self._get_last_error()
+		if code == self.ERROR_ACCESS_DENIED:
+			return False
+		raise OSError(f'{call} failed (error {code})')
+
+	def trim(self, pid: int) -> bool:
+		handle = self.kernel32.OpenProcess(self.PROCESS_SET_QUOTA | self.PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+		if not handle:
+			return self._fail('OpenProcess')
+		try:
+			if not self.psapi.EmptyWorkingSet(handle):
+				return self._fail('EmptyWorkingSet')
+			if not self.kernel32.SetProcessWorkingSetSize(handle, self._size_max, self._size_max):
+				return self._fail('SetProcessWorkingSetSize')
+		finally:
+			self.kernel32.CloseHandle(handle)
+		return True
+
+
+class FakeTrimBackend:
+	"""Backend for tests: sleeps instead of trimming.
+
+	``latency`` is the default per-call delay, ``stalls`` maps pid -> delay
+	for slow or hung processes and ``denied`` lists pids that cannot be
+	opened. Calls are recorded in ``calls``.
+	"""
+
+	def __init__(self, latency: float = 0.0, stalls: Optional[Dict[int, float]] = None, denied: Iterable[int] = ()):
+		self.latency = latency
+		self.stalls = dict(stalls or {})
+		self.denied = set(denied)
+		self.calls: List[int] = []
+		self._lock = threading.Lock()
+
+	def trim(self, pid: int) -> bool:
+		with self._lock:
+			self.calls.append(pid)
+		time.sleep(self.stalls.get(pid, self.latency))
+		return pid not in self.denied
+
+
+def default_backend():
+	if os.name == 'nt':
+		return WindowsTrimBackend()
+	raise RuntimeError('working-set trimming is only supported on Windows')
+
+
+# --- I/O pressure ---
+
+class IoPressure:
+	"""Disk pressure estimate in 0..1.
+
+	Uses ``/proc/pressure/io`` (``some avg10``) where present. Elsewhere it
+	uses the share of wall time the disks spent on reads and writes since
+	the previous call, from ``psutil.disk_io_counters``.
+	"""
+
+	def __init__(self, psi_path: str = '/proc/pressure/io'):
+		self.psi_path = psi_path if os.path.exists(psi_path) else None
+		self._last: Optional[Tuple[float, float]] = None
+
+	def __call__(self) -> float:
+		try:
+			if self.psi_path:
+				with open(self.psi_path, 'r') as f:
+					some = f.readline().split()
+				return min(float(some[1].split('=')[1]) / 100.0, 1.0)
+			io = psutil.disk_io_counters()
+			now = time.monotonic()
+			busy_ms = float(io.read_time + io.write_time)
+			last, self._last = self._last, (now, busy_ms)
+			if last is None or now <= last[0]:
+				return 0.0
+			return min(max((busy_ms - last[1]) / ((now - last[0]) * 1000.0), 0.0), 1.0)
+		except Exception:
+			return 0.0
+
+
+# --- Trimmer ---
+
+class ParallelTrimmer:
+	"""Trim many processes concurrently with per-process and overall limits.
+
+	``pressure`` is a callable returning 0..1; the number of concurrent trims
+	is scaled down from ``max_workers`` as it rises, never below one.
+	Threads stuck in a timed-out trim keep running (a blocked system call
+	cannot be cancelled); while ``max_workers`` of them are stuck no new
+	trims are started. Runs on one trimmer are serialized, so reusing a
+	trimmer bounds the worker threads across runs and callers.
+	"""
+
+	def __init__(self, backend=None, max_workers: int = 8, per_process_timeout: float = 2.0, deadline: float = 15.0, pressure: Optional[Callable[[], float]] = None, adapt_interval: float = 0.25, tracker=None):
+		self.backend = backend  # None: default_backend() on the first run
+		self.tracker = tracker
+		self.max_workers = max(1, int(max_workers))
+		self.per_process_timeout = per_process_timeout
+		self.deadline = deadline
+		self.pressure = pressure if pressure is not None else IoPressure()
+		self.adapt_interval = adapt_interval
+		self.limit = self.max_workers
+		self._stuck: List[threading.Thread] = []
+		self._lock = threading.Lock()
+
+	def _concurrency(self) -> int:
+		try:
+			p = float(self.pressure())
+		except Exception:
+			p = 0.0
+		return max(1, round(self.max_workers * (1.0 - min(max(p, 0.0), 1.0))))
+
+	def _work(self, task_id: int, pid: int, name: str, results: queue.Queue, tracker):
+		if tracker is not None:
+			tracker.before(pid)
+		start = time.monotonic()
+		try:
+			ok = self.backend.trim(pid)
+			status, error = ('trimmed' if ok else 'denied'), ''
+		except Exception as e:
+			status, error = 'error', str(e)
+		duration = time.monotonic() - start
+		if tracker is not None:
+			tracker.after(pid, name, status)
+		results.put((task_id, status, duration, error))
+
+	def run(self, targets: Iterable[Tuple[int, str]], tracker=None) -> TrimReport:
+		"""Trim each ``(pid, name)`` and return per-process results.
+
+		``tracker`` overrides the trimmer's own tracker for this run.
+		"""
+		with self._lock:
+			if self.backend is None:
+				self.backend = default_backend()
+			return self._run(targets, tracker if tracker is not None else self.tracker)
+
+	def _run(self, targets: Iterable[Tuple[int, str]], tracker) -> TrimReport:
+		t0 = time.monotonic()
+		deadline_at = t0 + self.deadline
+		pending = collections.deque(targets)
+		inflight: Dict[int, Tuple[int, str, float, threading.Thread]] = {}  # task_id -> (pid, name, start, thread)
+		results: List[TrimResult] = []
+		done: queue.Queue = queue.Queue()
+		next_id = 0
+		next_adapt = t0
+		deadline_hit = False
+
+		while pending or inflight:
+			now = time.monotonic()
+			if now >= deadline_at:
+				deadline_hit = True
+				break
+			if now >= next_adapt:
+				self.limit = self._concurrency()
+				next_adapt = now + self.adapt_interval
+			self._stuck = [t for t in self._stuck if t.is_alive()]
+			while pending and len(inflight) < self.limit and len(inflight) + len(self._stuck) < self.max_workers:
+				pid, name = pending.popleft()
+				worker = threading.Thread(target=self._work, args=(next_id, pid, name, done, tracker), name=f'trim-{pid}', daemon=True)
+				inflight[next_id] = (pid, name, time.monotonic(), worker)
+				worker.start()
+				next_id += 1
+
+			# wait for the next completion, per-process timeout, adapt tick or deadline
+			wake = min([deadline_at, next_adapt] + [task[2] + self.per_process_timeout for task in inflight.values()])
+			try:
+				task_id, status, duration, error = done.get(timeout=max(wake - time.monotonic(), 0.001))
+				if task_id in inflight:
+					pid, name, _, _ = inflight.pop(task_id)
+					results.append(TrimResult(pid, name, status, duration, error))
+			except queue.Empty:
+				pass
+
+			now = time.monotonic()
+			for task_id, (pid, name, start, worker) in list(inflight.items()):
+				if now - start >= self.per_process_timeout:
+					del inflight[task_id]
+					self._stuck.append(worker)
+					results.append(TrimResult(pid, name, 'timeout', now - start))
+
+		# drain completions that raced with the deadline
+		while True:
+			try:
+				task_id, status, duration, error = done.get_nowait()
+			except queue.Empty:
+				break
+			if task_id in inflight:
+				pid, name, _, _ = inflight.pop(task_id)
+				results.append(TrimResult(pid, name, status, duration, error))
+		now = time.monotonic()
+		for task_id, (pid, name, start, worker) in inflight.items():
+			self._stuck.append(worker)
+			results.append(TrimResult(pid, name, 'timeout', now - start))
+		for pid, name in pending:
+			results.append(TrimResult(pid, name, 'skipped', 0.0, 'deadline'))
+		return TrimReport(results, now - t0, deadline_hit)
@@ -0,0 +1,65 @@
+"""MetricRegistry budgeting: per-class buckets and debt repayment."""
+
+import time
+
+from mem_metrics import Collector, MetricRegistry, default_registry
+
+
+def slow_registry(delay):
+	reg = MetricRegistry(budget=0.05, burst=10)
+	reg.register_source('fast', lambda: 1)
+	reg.register_source('slow', lambda: time.sleep(delay) or 2)
+	reg.register(Collector('cheap_metric', 'fast', lambda v: v, 0.05, 'cheap'))
+	reg.register(Collector('walk', 'slow', lambda v: v, 0.05, 'expensive'))
+	return reg
+
+
+def test_expensive_group_does_not_starve_cheap_tier():
+	reg = slow_registry(0.5)
+	reg.tick()
+	assert reg.get('walk') == 2
+	assert reg.tokens()['expensive'] < 0
+	stale = []
+	for _ in range(10):
+		time.sleep(0.06)
+		reg.tick()
+		stale.append(reg.age('cheap_metric'))
+	assert max(stale) < 0.2
+	assert reg.tokens()['cheap'] > 0
+
+
+def test_debt_is_not_capped():
+	reg = slow_registry(0.5)
+	reg.tick()
+	cap = 0.05 * 0.5 * 10  # expensive share of the bucket
+	assert reg.tokens()['expensive'] < cap - 0.45
+
+
+def test_oversized_group_stays_within_its_share():
+	runs = []
+	reg = MetricRegistry(budget=0.1, burst=0.4)  # expensive bucket: 0.02 s, refilled at 0.05 s/s
+	reg.register_source('slow', lambda: runs.append(time.sleep(0.1)) or 1)
+	reg.register(Collector('walk', 'slow', lambda v: v, 0.05, 'expensive'))
+	start = time.monotonic()
+	while time.monotonic() - start < 2.5:
+		reg.tick()
+		time.sleep(0.05)
+	elapsed = time.monotonic() - start
+	# the full bucket, the refill over the run and at most one overshooting run
+	assert len(runs) * 0.1 <= 0.02 + 0.05 * elapsed + 0.1 + 0.02
+
+
+def test_oversized_group_waits_for_a_full_bucket():
+	reg = slow_registry(0.3)
+	reg.tick()
+	first = reg.collectors['walk'].updated
+	time.sleep(0.1)
+	reg.tick()
+	assert reg.collectors['walk'].updated == first
+	assert reg.deferred >= 1
+
+
+def test_default_registry_names_filter():
+	reg = default_registry(names=['commit', 'ram_percent'])
+	assert set(reg.collectors) <= {'commit', 'ram_percent'}
+	assert 'ram_percent' in reg.collectors
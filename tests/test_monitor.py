@@ -0,0 +1,110 @@
+"""MemoryMonitor with a counting sampler: sharing, downsampling, thresholds, cleanup."""
+
+import asyncio
+import threading
+import time
+
+import mem_monitor
+from mem_monitor import MemoryMonitor, MemorySample, Subscription
+
+
+def sample(percent=50.0, timestamp=None):
+	return MemorySample(time.time() if timestamp is None else timestamp, 100, int(percent), 100 - int(percent), percent, 0, 0, 0.0)
+
+
+class CountingSampler:
+	def __init__(self):
+		self.calls = 0
+
+	def __call__(self):
+		self.calls += 1
+		return sample()
+
+
+def wait_stopped(monitor, timeout=2.0):
+	end = time.monotonic() + timeout
+	while monitor._thread is not None and time.monotonic() < end:
+		time.sleep(0.01)
+	return monitor._thread is None
+
+
+def test_one_sampler_for_many_subscribers():
+	sampler = CountingSampler()
+	monitor = MemoryMonitor(sampler=sampler)
+	received = [[], [], []]
+	subs = [monitor.subscribe(r.append, interval=0.1) for r in received]
+	time.sleep(1.0)
+	monitor.close()
+	assert wait_stopped(monitor)
+	# ~10 ticks of one shared loop, not one loop per subscriber
+	assert 8 <= sampler.calls <= 13
+	for r in received:
+		assert len(r) >= 8
+	assert all(s.closed for s in subs)
+
+
+def test_each_subscriber_is_downsampled():
+	sampler = CountingSampler()
+	monitor = MemoryMonitor(sampler=sampler)
+	fast, slow = [], []
+	monitor.subscribe(fast.append, interval=0.1)
+	monitor.subscribe(slow.append, interval=0.3)
+	time.sleep(1.0)
+	monitor.close()
+	assert sampler.calls <= 13  # the loop runs at the fastest interval only
+	assert len(fast) >= 8
+	assert 3 <= len(slow) <= 5
+	gaps = [b.timestamp - a.timestamp for a, b in zip(slow, slow[1:])]
+	assert min(gaps) >= 0.3 * 0.95 - 0.01
+
+
+def test_threshold_hysteresis():
+	sub = Subscription(MemoryMonitor(sampler=CountingSampler()), interval=60.0)
+	events = []
+	sub.on_threshold(80.0, lambda s, e: events.append((s.ram_percent, e)), hysteresis=5.0)
+	for percent in (50, 81, 90, 79, 76, 74, 85, 70):
+		sub._deliver(sample(percent))
+	# 79 and 76 are inside the hysteresis band, so 'below' waits for 74
+	assert events == [(81, 'above'), (74, 'below'), (85, 'above'), (70, 'below')]
+
+
+def test_break_unsubscribes():
+	sampler = CountingSampler()
+	monitor = MemoryMonitor(sampler=sampler)
+
+	async def consume():
+		got = []
+		async for s in monitor.samples(interval=0.05):
+			got.append(s)
+			if len(got) == 3:
+				break
+		await asyncio.sleep(0.05)  # let the generator's cleanup run
+		return got
+
+	assert len(asyncio.run(consume())) == 3
+	assert monitor._subs == []
+	assert wait_stopped(monitor)
+	calls = sampler.calls
+	time.sleep(0.2)
+	assert sampler.calls == calls
+
+
+def test_request_cleanup_refuses_while_running(monkeypatch):
+	release = threading.Event()
+	runs = []
+
+	def slow_cleanup():
+		runs.append(1)
+		release.wait(5.0)
+		return True
+
+	monkeypatch.setattr(mem_monitor, 'cleanup_memory', slow_cleanup)
+	monitor = MemoryMonitor(sampler=CountingSampler())
+	assert monitor.request_cleanup()
+	assert monitor.cleanup_running()
+	assert not monitor.request_cleanup()
+	release.set()
+	monitor._cleanup_thread.join(2.0)
+	assert not monitor.cleanup_running()
+	assert monitor.request_cleanup(wait=True, timeout=2.0)
+	assert len(runs) == 2
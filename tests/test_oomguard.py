@@ -0,0 +1,164 @@
+"""OomGuard against spawned memory-hog processes."""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from mem_oomguard import OomGuard
+from mem_procscan import ProcInfo
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason='uses signals and /proc/<pid>/stat')
+
+HOG = 'import sys, time; data = bytearray(int(sys.argv[1]) << 20); data[::4096] = b"x" * len(data[::4096]); time.sleep(60)'
+
+
+def state(pid):
+	with open(f'/proc/{pid}/stat', 'rb') as f:
+		data = f.read()
+	return data[data.rfind(b')') + 2:].split()[0].decode()
+
+
+def stopped(pid, timeout=2.0):
+	"""Whether ``pid`` is stopped; signals are delivered asynchronously."""
+	end = time.monotonic() + timeout
+	while state(pid) != 'T' and time.monotonic() < end:
+		time.sleep(0.01)
+	return state(pid) == 'T'
+
+
+def running(pid, timeout=2.0):
+	end = time.monotonic() + timeout
+	while state(pid) == 'T' and time.monotonic() < end:
+		time.sleep(0.01)
+	return state(pid) != 'T'
+
+
+def wait_rss(pid, mb, timeout=10.0):
+	end = time.monotonic() + timeout
+	while time.monotonic() < end:
+		with open(f'/proc/{pid}/statm') as f:
+			if int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') >= mb << 20:
+				return
+		time.sleep(0.02)
+	raise TimeoutError(pid)
+
+
+@pytest.fixture
+def hogs():
+	procs = [subprocess.Popen([sys.executable, '-c', HOG, str(mb)]) for mb in (120, 60)]
+	try:
+		for proc, mb in zip(procs, (120, 60)):
+			wait_rss(proc.pid, mb)
+		yield [p.pid for p in procs]
+	finally:
+		for proc in procs:
+			proc.kill()
+			proc.wait()
+
+
+def make_guard(hogs, tmp_path, **kwargs):
+	kwargs.setdefault('available_percent', 101.0)  # always under pressure
+	kwargs.setdefault('psi_full', None)
+	kwargs.setdefault('cooldown', 0.0)
+	kwargs.setdefault('dry_run', False)
+	guard = OomGuard(audit_log=str(tmp_path / 'audit.jsonl'), candidate_filter=lambda pid, info: pid in hogs, **kwargs)
+	guard.refresh_candidates()
+	return guard
+
+
+def audit(tmp_path):
+	with open(tmp_path / 'audit.jsonl', encoding='utf-8') as f:
+		return [json.loads(line) for line in f]
+
+
+def test_suspends_largest_then_next(hogs, tmp_path):
+	guard = make_guard(hogs, tmp_path, resume_available_percent=None)
+	try:
+		event = guard.check()
+		assert [p['pid'] for p in event['processes']] == [hogs[0]]
+		assert stopped(hogs[0])
+		# the already suspended hog is not chosen again, even after a refresh
+		guard.refresh_candidates()
+		event = guard.check()
+		assert [p['pid'] for p in event['processes']] == [hogs[1]]
+		assert stopped(hogs[1])
+		assert guard.check() is None  # nothing left to act on; audited as 'none'
+	finally:
+		guard.stop()
+	# stopping the guard resumes everything it suspended
+	assert running(hogs[0]) and running(hogs[1])
+	actions = [e['action'] for e in audit(tmp_path)]
+	assert actions == ['suspend', 'suspend', 'none', 'resume']
+
+
+def test_resumes_when_pressure_clears(hogs, tmp_path):
+	guard = make_guard(hogs, tmp_path, resume_available_percent=0.0)
+	guard.check()
+	assert stopped(hogs[0])
+	assert guard.suspended() == [(hogs[0], guard.suspended()[0][1])]
+	guard.available_percent = 0.0  # pressure gone
+	event = guard.check()
+	assert event['action'] == 'resume'
+	assert event['processes'][0]['result'] == 'ok'
+	assert running(hogs[0])
+	assert guard.suspended() == []
+	guard.stop()
+
+
+def test_dry_run_only_audits(hogs, tmp_path):
+	guard = make_guard(hogs, tmp_path, dry_run=True)
+	event = guard.check()
+	assert event['dry_run'] and event['processes'][0]['result'] == 'dry-run'
+	assert not stopped(hogs[0], timeout=0.2)
+	assert guard.suspended() == []
+	guard.stop()
+
+
+def test_kill_reaction_time(hogs, tmp_path):
+	guard = make_guard(hogs, tmp_path, action='kill')
+	event = guard.check()
+	assert event['processes'][0]['result'] == 'ok'
+	assert event['latency_ms'] < 100
+	os.waitpid(hogs[0], 0)
+	guard.stop()
+
+
+class FakeBackend:
+	def __init__(self, name, snap):
+		self.name = name
+		self.snap = snap
+
+	def snapshot(self):
+		return dict(self.snap)
+
+
+MB = 1 << 20
+
+
+def test_long_protected_name_matches_truncated_comm():
+	info = ProcInfo(1, 'systemd-journal', 50 * MB, 1.0)  # procfs comm of systemd-journald
+	guard = OomGuard(protected=['systemd-journald'], backend=FakeBackend('procfs', {}))
+	assert not guard._allowed(4242, info)
+	# psutil reports the full name, which is what the list is compared with
+	guard = OomGuard(protected=['systemd-journald'], backend=FakeBackend('psutil', {}))
+	assert not guard._allowed(4242, info._replace(name='systemd-journald'))
+	assert guard._allowed(4242, info._replace(name='other'))
+
+
+def test_application_with_zombie_member_stays_eligible():
+	snap = {
+		1: ProcInfo(0, 'systemd', 10 * MB, 1.0),
+		100: ProcInfo(1, 'browser', 300 * MB, 2.0),
+		101: ProcInfo(100, 'browser', 200 * MB, 3.0),
+		102: ProcInfo(100, 'browser', 0, 4.0),  # zombie
+		200: ProcInfo(1, 'editor', 400 * MB, 5.0),
+		201: ProcInfo(200, 'helper-daemon', 10 * MB, 6.0),
+	}
+	guard = OomGuard(target='application', protected=['helper-daemon'], backend=FakeBackend('procfs', snap))
+	guard.refresh_candidates()
+	# the editor is vetoed by its protected helper; the browser loses only its zombie
+	assert [(rss, sorted(pid for pid, _ in members)) for rss, members in guard._ranking] == [(500 * MB, [100, 101])]
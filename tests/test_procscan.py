@@ -0,0 +1,76 @@
+"""ProcfsBackend against psutil on a synthetic /proc tree."""
+
+import os
+import random
+import sys
+
+import psutil
+import pytest
+
+from mem_procscan import ProcfsBackend, PsutilBackend
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason='procfs layout is Linux only')
+
+NAMES = ['bash', 'python3', 'my proc (x)', 'kworker/0:1', 'a) b (c']
+LONG_COMM = 'abcdefghijklmno'  # comm is cut to 15 characters by the kernel
+LONG_NAME = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def make_proc(root, count, seed=1):
+	rnd = random.Random(seed)
+	os.makedirs(root, exist_ok=True)
+	with open(os.path.join(root, 'stat'), 'w') as f:
+		f.write('cpu  1 2 3 4 5 6 7\nbtime 1700000000\n')
+	with open(os.path.join(root, 'uptime'), 'w') as f:
+		f.write('100000.00 1000.00\n')
+	for i in range(count):
+		pid = 100 + i
+		name = LONG_COMM if i == count - 1 else rnd.choice(NAMES)
+		cmdline = f'/usr/bin/{LONG_NAME}\0--flag\0' if name == LONG_COMM else f'{name}\0'
+		rss = rnd.randint(0, 100000)
+		ppid = 1 if i == 0 else 100 + rnd.randrange(i)
+		start = rnd.randint(100, 90000)
+		fields = ['S', str(ppid)] + ['0'] * 17 + [str(start), '1000000', str(rss)] + ['0'] * 27
+		d = os.path.join(root, str(pid))
+		os.makedirs(d)
+		with open(os.path.join(d, 'stat'), 'w') as f:
+			f.write(f'{pid} ({name}) ' + ' '.join(fields) + '\n')
+		with open(os.path.join(d, 'statm'), 'w') as f:
+			f.write(f'2000 {rss} 10 1 0 5 0\n')
+		with open(os.path.join(d, 'status'), 'w') as f:
+			f.write(f'Name:\t{name}\nPPid:\t{ppid}\n')
+		with open(os.path.join(d, 'cmdline'), 'w') as f:
+			f.write(cmdline)
+
+
+@pytest.fixture
+def fake_proc(tmp_path, monkeypatch):
+	root = str(tmp_path / 'proc')
+	make_proc(root, 300)
+	monkeypatch.setattr(psutil, 'PROCFS_PATH', root)
+	return root
+
+
+def test_matches_psutil(fake_proc):
+	expected = PsutilBackend().snapshot()
+	actual = ProcfsBackend(fake_proc).snapshot()
+	assert set(actual) == set(expected)
+	for pid, info in actual.items():
+		ref = expected[pid]
+		assert (info.ppid, info.rss) == (ref.ppid, ref.rss), pid
+		assert info.create_time == pytest.approx(ref.create_time, abs=0.01), pid
+		if info.name == LONG_COMM:
+			# psutil completes truncated names from the command line
+			assert ref.name == LONG_NAME
+		else:
+			assert info.name == ref.name, pid
+
+
+def test_skips_vanished_and_malformed(fake_proc):
+	os.remove(os.path.join(fake_proc, '100', 'stat'))
+	with open(os.path.join(fake_proc, '101', 'stat'), 'w') as f:
+		f.write('101 (short) S 1\n')
+	os.makedirs(os.path.join(fake_proc, 'self'))
+	snap = ProcfsBackend(fake_proc).snapshot()
+	assert 100 not in snap and 101 not in snap
+	assert len(snap) == 298
@@ -0,0 +1,41 @@
+"""ProcessTree.trim_app against live children and a reused pid."""
+
+import subprocess
+import sys
+
+import psutil
+import pytest
+
+import mem_cleanup
+from mem_procscan import ProcInfo
+from mem_proctree import ProcessTree
+from mem_trim import FakeTrimBackend, ParallelTrimmer
+
+
+@pytest.fixture
+def children():
+	procs = [subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']) for _ in range(3)]
+	yield [p.pid for p in procs]
+	for p in procs:
+		p.kill()
+		p.wait()
+
+
+def test_trim_app_skips_reused_and_exited_pids(children, monkeypatch):
+	backend = FakeTrimBackend()
+	monkeypatch.setattr(mem_cleanup, 'TRIMMER', ParallelTrimmer(backend, pressure=lambda: 0.0))
+	root, reused, gone = children
+	started = {pid: psutil.Process(pid).create_time() for pid in children}
+	tree = ProcessTree(backend=object())
+	tree.update({
+		1: ProcInfo(0, 'systemd', 1 << 20, 0.0),
+		root: ProcInfo(1, 'app', 100 << 20, started[root]),
+		# the tree saw an earlier process under this pid
+		reused: ProcInfo(root, 'app', 50 << 20, started[reused] - 60.0),
+		gone: ProcInfo(root, 'app', 50 << 20, started[gone]),
+	})
+	psutil.Process(gone).kill()
+	psutil.Process(gone).wait(5)
+	report = tree.trim_app(root)
+	assert backend.calls == [root]
+	assert [r.pid for r in report.results] == [root]
@@ -0,0 +1,138 @@
+"""RefaultTracker with scripted counters and FakeTrimBackend."""
+
+import subprocess
+import sys
+import time
+
+import pytest
+
+from mem_cleanup import trim_working_sets
+from mem_refault import ProcCounters, RefaultTracker
+from mem_trim import FakeTrimBackend, ParallelTrimmer
+
+MB = 1024 ** 2
+
+
+class Counters:
+	"""Scripted sampler: each pid's counters advance by fixed rates per call."""
+
+	def __init__(self):
+		self.state = {}  # pid -> dict of counters and per-call increments
+
+	def add(self, pid, cpu_step=0.0, rss=100 * MB, fault_step=0, read_step=0):
+		self.state[pid] = {'cpu': 0.0, 'faults': 0, 'read': 0, 'rss': rss, 'cpu_step': cpu_step, 'fault_step': fault_step, 'read_step': read_step}
+
+	def __call__(self, pid):
+		s = self.state.get(pid)
+		if s is None:
+			return None
+		s['cpu'] += s['cpu_step']
+		s['faults'] += s['fault_step']
+		s['read'] += s['read_step']
+		return ProcCounters(time.monotonic(), s['cpu'], s['faults'], s['read'], s['rss'])
+
+
+class Trimming(FakeTrimBackend):
+	"""Drops a pid's RSS to ``to`` when it is trimmed."""
+
+	def __init__(self, counters, to=10 * MB):
+		super().__init__()
+		self.counters = counters
+		self.to = to
+
+	def trim(self, pid):
+		self.counters.state[pid]['rss'] = self.to
+		return super().trim(pid)
+
+
+@pytest.fixture
+def pids():
+	"""Two live processes, so trim_working_sets can look up their names."""
+	procs = [subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']) for _ in range(2)]
+	yield [p.pid for p in procs]
+	for p in procs:
+		p.kill()
+		p.wait()
+
+
+def tracker(counters, **kwargs):
+	kwargs.setdefault('probe', 0.05)
+	kwargs.setdefault('window', 0.0)
+	return RefaultTracker(sampler=counters, **kwargs)
+
+
+def test_busy_processes_are_deferred(pids):
+	idle, busy = pids
+	counters = Counters()
+	counters.add(idle)
+	counters.add(busy, cpu_step=0.05)  # 0.05 s CPU per 0.05 s probe: a full core
+	tr = tracker(counters)
+	backend = Trimming(counters)
+	report = trim_working_sets(pids, trimmer=ParallelTrimmer(backend, pressure=lambda: 0.0), tracker=tr)
+	statuses = {r.pid: r.status for r in report.results}
+	assert statuses == {idle: 'trimmed', busy: 'deferred'}
+	assert backend.calls == [idle]
+
+
+def test_passed_trimmer_uses_the_tracker(pids):
+	counters = Counters()
+	counters.add(pids[0])
+	tr = tracker(counters)
+	trimmer = ParallelTrimmer(Trimming(counters), pressure=lambda: 0.0)
+	trim_working_sets(pids[:1], trimmer=trimmer, tracker=tr)
+	assert tr.pending() == 1
+	# only for that run; the trimmer may be shared with untracked callers
+	assert trimmer.tracker is None
+	trim_working_sets(pids[:1], trimmer=trimmer)
+	assert tr.pending() == 1
+
+
+def test_net_benefit_and_penalty():
+	counters = Counters()
+	counters.add(1)
+	counters.add(2)
+	tr = tracker(counters)
+	trimmer = ParallelTrimmer(Trimming(counters), pressure=lambda: 0.0, tracker=tr)
+	trimmer.run(tr.select([(1, 'idle'), (2, 'refaulting')])[0])
+	# pid 2 pages everything back in from disk; pid 1 stays small
+	counters.state[2].update(rss=100 * MB, read=counters.state[2]['read'] + 200 * MB, faults=25000)
+	outcomes = {o.pid: o for o in tr.poll()}
+	assert outcomes[1].freed == 90 * MB and outcomes[1].net == 90 * MB
+	assert outcomes[2].regrown == 90 * MB and outcomes[2].refaults == 25000
+	assert outcomes[2].net < 0
+	assert tr.penalized('refaulting') and not tr.penalized('idle')
+	assert '1 helped, 1 refaulted' in tr.summary()
+	_, deferred = tr.select([(3, 'refaulting')])
+	assert deferred == []  # pid 3 has no counters, so it is trimmed as before
+	counters.add(3)
+	_, deferred = tr.select([(3, 'refaulting')])
+	assert deferred == [(3, 'refaulting', 'previous trim was refaulted')]
+
+
+def test_stale_baselines_are_dropped():
+	counters = Counters()
+	counters.add(1, fault_step=1000)
+	tr = tracker(counters)
+	tr.select([(1, 'never trimmed')])
+	assert 1 in tr._baseline
+	tr.select([])
+	assert tr._baseline == {}
+
+
+def test_conflicting_trackers_are_rejected(pids, capsys):
+	counters = Counters()
+	counters.add(pids[0])
+	trimmer = ParallelTrimmer(Trimming(counters), pressure=lambda: 0.0, tracker=tracker(counters))
+	report = trim_working_sets(pids[:1], trimmer=trimmer, tracker=tracker(counters))
+	assert report.results == []
+	assert 'different refault tracker' in capsys.readouterr().out
+
+
+def test_gone_process():
+	counters = Counters()
+	counters.add(1)
+	tr = tracker(counters)
+	ParallelTrimmer(Trimming(counters), pressure=lambda: 0.0, tracker=tr).run([(1, 'x')])
+	del counters.state[1]
+	assert [o.status for o in tr.poll()] == ['gone']
+	assert tr.poll() == [] and tr.pending() == 0
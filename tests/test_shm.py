@@ -0,0 +1,72 @@
+"""Shared sample segment: round trip and publisher restarts."""
+
+import os
+import time
+
+import pytest
+
+from mem_monitor import MemorySample
+from mem_shm import SharedSampleReader, SharedSampleWriter, TopRow
+
+
+def sample(percent, ts=None):
+	return MemorySample(ts or time.time(), 16 << 30, 8 << 30, 8 << 30, percent, 4 << 30, 1 << 30, 25.0)
+
+
+@pytest.fixture
+def name():
+	return f'mem_shm_test_{os.getpid()}_{time.monotonic_ns()}'
+
+
+def test_round_trip(name):
+	writer = SharedSampleWriter(name, history_capacity=4, top_capacity=2)
+	reader = SharedSampleReader(name)
+	try:
+		for i in range(6):
+			writer.publish(sample(10.0 + i), [TopRow(1, 2, 3 << 20, 'app'), TopRow(4, 1, 1 << 20, 'x' * 40)])
+		snap = reader.snapshot()
+		assert snap.latest.ram_percent == 15.0
+		assert [s.ram_percent for s in snap.history] == [12.0, 13.0, 14.0, 15.0]
+		assert snap.top[0] == TopRow(1, 2, 3 << 20, 'app')
+		assert snap.top[1].name == 'x' * 32
+	finally:
+		reader.close()
+		writer.close()
+
+
+def test_reader_follows_restarted_publisher(name):
+	reader = SharedSampleReader(name, check_interval=0.0)
+	writer = SharedSampleWriter(name)
+	writer.publish(sample(50.0))
+	assert reader.latest().ram_percent == 50.0
+	writer.close()
+	writer = SharedSampleWriter(name)
+	try:
+		writer.publish(sample(77.0))
+		assert reader.latest().ram_percent == 77.0
+	finally:
+		reader.close()
+		writer.close()
+
+
+def test_stale_segment_is_remapped(name):
+	reader = SharedSampleReader(name, check_interval=0.0, reopen_after=1.0)
+	writer = SharedSampleWriter(name)
+	try:
+		writer.publish(sample(40.0, ts=time.time() - 10))
+		assert reader.latest().ram_percent == 40.0
+		view = reader._view
+		reader.latest()
+		assert reader._view is not view  # remapped because nothing new was published
+		assert not reader.is_live(max_age=5.0)
+		writer.publish(sample(41.0))
+		assert reader.is_live(max_age=5.0)
+	finally:
+		reader.close()
+		writer.close()
+
+
+def test_no_publisher(name):
+	reader = SharedSampleReader(name)
+	assert reader.latest() is None
+	assert reader.snapshot() is None
@@ -0,0 +1,133 @@
+"""Sink overflow policies and SinkHub isolation, with sinks blocked on an Event."""
+
+import threading
+import time
+
+from mem_monitor import MemorySample
+from mem_sinks import CallbackSink, SinkHub
+
+
+def sample(timestamp):
+	return MemorySample(timestamp, 100, 50, 50, 50.0, 0, 0, 0.0)
+
+
+def wait_for(condition, timeout=2.0):
+	end = time.monotonic() + timeout
+	while not condition() and time.monotonic() < end:
+		time.sleep(0.005)
+	return condition()
+
+
+def blocked_sink(release, **kwargs):
+	"""A started sink whose handler waits for ``release``; returns (sink, handled timestamps)."""
+	handled = []
+
+	def handle(s):
+		release.wait(5.0)
+		handled.append(s.timestamp)
+
+	sink = CallbackSink(handle, **kwargs)
+	sink.start()
+	return sink, handled
+
+
+def fill(sink, count):
+	# the worker takes the first sample and blocks on it; the rest queue up
+	sink.offer(sample(0))
+	assert wait_for(lambda: sink.stats()['pending'] == 0)
+	for i in range(1, count):
+		sink.offer(sample(i))
+
+
+def test_drop_oldest():
+	release = threading.Event()
+	sink, handled = blocked_sink(release, maxsize=3, overflow='drop_oldest')
+	fill(sink, 10)
+	stats = sink.stats()
+	assert (stats['received'], stats['pending'], stats['dropped']) == (10, 3, 6)
+	release.set()
+	sink.stop()
+	assert handled == [0, 7, 8, 9]
+	assert sink.delivered == 4
+
+
+def test_latest_keeps_only_the_newest():
+	release = threading.Event()
+	sink, handled = blocked_sink(release, maxsize=100, overflow='latest')
+	fill(sink, 10)
+	stats = sink.stats()
+	assert (stats['pending'], stats['dropped']) == (1, 8)
+	release.set()
+	sink.stop()
+	assert handled == [0, 9]
+
+
+def test_block_waits_then_drops_once_stuck():
+	release = threading.Event()
+	sink, handled = blocked_sink(release, maxsize=1, overflow='block', block_timeout=0.05, stall_after=0.3)
+	fill(sink, 2)  # one handling, one queued
+	start = time.monotonic()
+	sink.offer(sample(2))
+	waited = time.monotonic() - start
+	assert 0.04 <= waited < 0.2
+	time.sleep(0.3)
+	# no progress for stall_after: dropped without waiting
+	start = time.monotonic()
+	sink.offer(sample(3))
+	assert time.monotonic() - start < 0.02
+	assert sink.dropped == 2
+	release.set()
+	sink.stop()
+	assert handled == [0, 1]
+
+
+def test_lag_and_counters():
+	release = threading.Event()
+	sink, _ = blocked_sink(release, maxsize=8)
+	now = time.time()
+	sink.offer(sample(now - 5.0))
+	assert wait_for(lambda: sink.stats()['pending'] == 0)
+	sink.offer(sample(now - 2.0))
+	sink.offer(sample(now - 1.0))
+	stats = sink.stats()
+	assert stats['pending'] == 2
+	assert 2.0 <= stats['lag_seconds'] < 3.0  # age of the oldest queued sample
+	release.set()
+	assert wait_for(lambda: sink.delivered == 3)
+	assert sink.stats()['lag_seconds'] == 0.0
+	assert sink.last_delivered == now - 1.0
+	sink.stop()
+
+
+def test_handler_errors_are_counted():
+	def fail(s):
+		raise RuntimeError('push failed')
+
+	sink = CallbackSink(fail)
+	sink.start()
+	sink.offer(sample(1))
+	assert wait_for(lambda: sink.errors == 1)
+	assert sink.delivered == 0
+	sink.stop()
+
+
+def test_stuck_sink_does_not_hold_up_others():
+	release = threading.Event()
+	hub = SinkHub()
+	stuck, _ = blocked_sink(release, name='stuck', maxsize=1, overflow='block', block_timeout=0.05, stall_after=0.1)
+	hub.add(stuck)
+	fast = []
+	hub.add(CallbackSink(lambda s: fast.append(s.timestamp), name='fast', maxsize=64))
+	start = time.monotonic()
+	for i in range(50):
+		hub.publish(sample(i))
+	elapsed = time.monotonic() - start
+	# a few bounded waits until the stuck sink counts as stalled, then none
+	assert elapsed < 0.4
+	assert wait_for(lambda: len(fast) == 50)
+	assert fast == list(range(50))
+	stats = {s['name']: s for s in hub.stats()}
+	assert stats['fast']['dropped'] == 0
+	assert stats['stuck']['received'] == 50 and stats['stuck']['dropped'] >= 48
+	release.set()
+	hub.close()
@@ -0,0 +1,127 @@
+"""smaps parsing and SmapsCache on a synthetic /proc/<pid> tree."""
+
+import os
+import random
+import sys
+import time
+
+import pytest
+
+import mem_smaps
+from mem_smaps import SmapsCache, parse_smaps, summarize_by_kind
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason='smaps layout is Linux only')
+
+PID = 4321
+PATHS = ['', '[heap]', '[stack]', '[vdso]', '/usr/lib/x86_64-linux-gnu/libc.so.6', '/usr/lib/libfoo.so', '/var/lib/data.db', '/dev/shm/segment', '/memfd:buffer (deleted)']
+FIELDS = [
+	'Size', 'KernelPageSize', 'MMUPageSize', 'Rss', 'Pss', 'Pss_Dirty', 'Shared_Clean', 'Shared_Dirty',
+	'Private_Clean', 'Private_Dirty', 'Referenced', 'Anonymous', 'KSM', 'LazyFree', 'AnonHugePages',
+	'ShmemPmdMapped', 'FilePmdMapped', 'Shared_Hugetlb', 'Private_Hugetlb', 'Swap', 'SwapPss', 'Locked',
+]
+
+
+def block(i, path, rss, pss, swap):
+	start = 0x7f0000000000 + i * 0x10000
+	header = f'{start:x}-{start + 0x10000:x} rw-p 00000000 00:00 {i if path else 0}'
+	lines = [f'{header:<72} {path}' if path else header + ' ']
+	# decoys: Pss_Dirty and SwapPss must not be taken for Pss and Swap
+	values = {'Size': 64, 'Rss': rss, 'Pss': pss, 'Pss_Dirty': pss + 7, 'Swap': swap, 'SwapPss': swap + 3}
+	for field in FIELDS:
+		lines.append(f"{field + ':':<16}{values.get(field, 0):>8} kB")
+	lines += ['THPeligible:           0', 'ProtectionKey:         0', 'VmFlags: rd wr mr mw me ac ']
+	return '\n'.join(lines) + '\n'
+
+
+def write_process(root, count, seed=1, starttime=5000):
+	"""Write stat, maps and smaps for PID; returns the expected totals by path."""
+	rnd = random.Random(seed)
+	d = os.path.join(root, str(PID))
+	os.makedirs(d, exist_ok=True)
+	expected = {}
+	blocks = []
+	for i in range(count):
+		path = rnd.choice(PATHS)
+		rss, pss, swap = rnd.randint(0, 5000), rnd.randint(0, 5000), rnd.randint(0, 500)
+		blocks.append(block(i, path, rss, pss, swap))
+		e = expected.setdefault(path, [0, 0, 0, 0])
+		e[0] += 1
+		e[1] += rss * 1024
+		e[2] += pss * 1024
+		e[3] += swap * 1024
+	with open(os.path.join(d, 'smaps'), 'w') as f:
+		f.write(''.join(blocks))
+	with open(os.path.join(d, 'maps'), 'w') as f:
+		f.write(''.join(b.split('\n', 1)[0] + '\n' for b in blocks))
+	with open(os.path.join(d, 'stat'), 'w') as f:
+		f.write(f'{PID} (a) b (c) S 1 ' + ' '.join(['0'] * 17 + [str(starttime)] + ['0'] * 30) + '\n')
+	with open(os.path.join(d, 'smaps_rollup'), 'w') as f:
+		f.write('00400000-7fff00000000 ---p 00000000 00:00 0 [rollup]\nRss:  1024 kB\nPss:  512 kB\nSwap: 0 kB\n')
+	return expected, blocks
+
+
+def by_path(groups):
+	# every path in PATHS is its own backing
+	return {g.backing: [g.count, g.rss, g.pss, g.swap] for g in groups}
+
+
+def test_totals_across_the_chunk_edge(tmp_path):
+	root = str(tmp_path)
+	expected, blocks = write_process(root, 3000)
+	# the 1 MiB read boundary falls inside a mapping, not between two
+	offsets = [0]
+	for b in blocks:
+		offsets.append(offsets[-1] + len(b))
+	assert offsets[-1] > mem_smaps.CHUNK_SIZE and mem_smaps.CHUNK_SIZE not in offsets
+	mappings, groups = parse_smaps(PID, root)
+	assert mappings == 3000
+	assert by_path(groups) == expected
+	assert [g.rss for g in groups] == sorted((g.rss for g in groups), reverse=True)
+
+
+def test_small_chunks_split_every_field(tmp_path, monkeypatch):
+	root = str(tmp_path)
+	expected, _ = write_process(root, 200)
+	monkeypatch.setattr(mem_smaps, 'CHUNK_SIZE', 97)
+	mappings, groups = parse_smaps(PID, root)
+	assert mappings == 200
+	assert by_path(groups) == expected
+
+
+def test_kinds():
+	assert mem_smaps.region_kind('') == ('anonymous', '')
+	assert mem_smaps.region_kind('[heap]') == ('heap', '[heap]')
+	assert mem_smaps.region_kind('[stack:123]') == ('stack', '[stack]')
+	assert mem_smaps.region_kind('[vdso]') == ('special', '[vdso]')
+	assert mem_smaps.region_kind('/usr/lib/libc.so.6')[0] == 'shared library'
+	assert mem_smaps.region_kind('/dev/shm/segment')[0] == 'shared memory'
+	assert mem_smaps.region_kind('/var/lib/data.db')[0] == 'mapped file'
+
+
+def test_fifty_thousand_mappings_parse_fast(tmp_path):
+	root = str(tmp_path)
+	expected, _ = write_process(root, 50000)
+	start = time.perf_counter()
+	mappings, groups = parse_smaps(PID, root)
+	elapsed = time.perf_counter() - start
+	assert mappings == 50000
+	assert sum(g.rss for g in summarize_by_kind(groups)) == sum(e[1] for e in expected.values())
+	assert elapsed < 1.0
+
+
+def test_cache_reparses_only_on_change(tmp_path):
+	root = str(tmp_path)
+	write_process(root, 500)
+	cache = SmapsCache(root=root)
+	first = cache.breakdown(PID)
+	assert first.rollup == {'Rss': 1024 * 1024, 'Pss': 512 * 1024, 'Swap': 0}
+	assert cache.breakdown(PID) is first
+	assert cache.parses == 1
+	# one more mapping
+	write_process(root, 501)
+	assert cache.breakdown(PID).mappings == 501
+	assert cache.parses == 2
+	# same mapping count, but the pid now belongs to another process
+	write_process(root, 501, seed=2, starttime=9000)
+	cache.breakdown(PID)
+	assert cache.parses == 3
@@ -0,0 +1,130 @@
+"""ParallelTrimmer with FakeTrimBackend: timeouts, deadline, denial, stuck workers."""
+
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import mem_cleanup
+from mem_cleanup import trim_working_sets
+from mem_trim import FakeTrimBackend, ParallelTrimmer
+
+
+def targets(pids):
+	return [(pid, f'p{pid}') for pid in pids]
+
+
+def statuses(report):
+	return {r.pid: r.status for r in report.results}
+
+
+def make(backend, **kwargs):
+	kwargs.setdefault('pressure', lambda: 0.0)
+	return ParallelTrimmer(backend, **kwargs)
+
+
+def test_all_trimmed_in_parallel():
+	backend = FakeTrimBackend(latency=0.1)
+	report = make(backend, max_workers=8).run(targets(range(16)))
+	assert statuses(report) == {pid: 'trimmed' for pid in range(16)}
+	assert not report.deadline_hit
+	assert report.elapsed < 0.6  # 16 x 0.1 s serially
+	assert sorted(backend.calls) == list(range(16))
+
+
+def test_denied_and_error():
+	class Failing(FakeTrimBackend):
+		def trim(self, pid):
+			if pid == 3:
+				raise OSError('EmptyWorkingSet failed (error 6)')
+			return super().trim(pid)
+
+	report = make(Failing(denied=[2])).run(targets([1, 2, 3]))
+	assert statuses(report) == {1: 'trimmed', 2: 'denied', 3: 'error'}
+	error = next(r for r in report.results if r.pid == 3)
+	assert 'error 6' in error.error
+
+
+def test_per_process_timeout():
+	backend = FakeTrimBackend(latency=0.01, stalls={5: 1.0})
+	start = time.monotonic()
+	report = make(backend, per_process_timeout=0.2).run(targets(range(10)))
+	assert time.monotonic() - start < 0.8
+	result = statuses(report)
+	assert result.pop(5) == 'timeout'
+	assert set(result.values()) == {'trimmed'}
+
+
+def test_deadline_skips_pending():
+	backend = FakeTrimBackend(latency=0.2)
+	report = make(backend, max_workers=2, per_process_timeout=5.0, deadline=0.5).run(targets(range(20)))
+	assert report.deadline_hit
+	assert report.elapsed < 0.8
+	counts = report.counts()
+	assert counts['skipped'] >= 10
+	assert sum(counts.values()) == 20
+	assert 'deadline reached' in report.summary()
+
+
+def test_stuck_workers_hold_slots_across_runs():
+	release = threading.Event()
+
+	class Hanging(FakeTrimBackend):
+		def trim(self, pid):
+			if pid < 2:
+				release.wait(5.0)
+			return super().trim(pid)
+
+	trimmer = make(Hanging(), max_workers=2, per_process_timeout=0.1, deadline=0.5)
+	first = trimmer.run(targets([0, 1, 2]))
+	assert statuses(first)[0] == statuses(first)[1] == 'timeout'
+	# both workers are still blocked, so nothing new may start
+	second = trimmer.run(targets([3]))
+	assert statuses(second) == {3: 'skipped'}
+	release.set()
+	time.sleep(0.1)
+	third = trimmer.run(targets([4]))
+	assert statuses(third) == {4: 'trimmed'}
+
+
+def test_concurrency_follows_pressure():
+	trimmer = make(FakeTrimBackend(), max_workers=8, pressure=lambda: 0.75)
+	trimmer.run(targets([1]))
+	assert trimmer.limit == 2
+	assert make(FakeTrimBackend(), max_workers=8, pressure=lambda: 5.0)._concurrency() == 1
+
+
+@pytest.fixture
+def children():
+	procs = [subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']) for _ in range(2)]
+	yield [p.pid for p in procs]
+	for p in procs:
+		p.kill()
+		p.wait()
+
+
+def test_exited_pids_are_skipped(children):
+	gone = subprocess.Popen([sys.executable, '-c', 'pass'])
+	gone.wait()
+	report = trim_working_sets([children[0], gone.pid, children[1]], trimmer=make(FakeTrimBackend()))
+	assert statuses(report) == {children[0]: 'trimmed', children[1]: 'trimmed'}
+
+
+def test_cleanup_paths_share_one_trimmer(children, monkeypatch):
+	release = threading.Event()
+
+	class Hanging(FakeTrimBackend):
+		def trim(self, pid):
+			release.wait(5.0)
+			return super().trim(pid)
+
+	shared = make(Hanging(), max_workers=1, per_process_timeout=0.1, deadline=0.5)
+	monkeypatch.setattr(mem_cleanup, 'TRIMMER', shared)
+	try:
+		assert statuses(trim_working_sets(children[:1])) == {children[0]: 'timeout'}
+		# a second caller sees the worker still stuck from the first
+		assert statuses(trim_working_sets(children[1:])) == {children[1]: 'skipped'}
+	finally:
+		release.set()